@@ -0,0 +1,248 @@
+"""Time every stage of the load -> segment -> filter -> assemble -> format pipeline, and the updater,
+on synthetic workbooks in the NAV/*.xlsx layout, and record time and peak memory per stage.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline [--sizes 1000 10000 100000 1000000] [--repeat 3] [--compare RESULTS.json]
+
+Each run is saved to benchmarks/results/ (unless --no-save) and compared with --compare, or with the
+previous saved run. Generated workbooks are kept in benchmarks/.workbooks/ and reused.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.synthetic import default_end_date, make_closes, write_nav_workbook
+from date_filtered_nav_dashboard import (
+    build_nav_index,
+    format_table_data,
+    handle_repeated_dates,
+    highlight_rows_with_strings,
+    insert_stock_names_above_data,
+    load_nav_column,
+    load_nav_data,
+    process_excel_data,
+    range_rows,
+    stock_name_row_mask,
+)
+from nav_cache import CACHE_DIR
+from nav_ledger import clear_ledger
+from nav_updater import WORKBOOK_DIR, modify_workbook
+from price_fetch import StaticPriceProvider
+from price_store import PRICE_STORE_PATH
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKBOOK_CACHE_DIR = os.path.join(BENCHMARK_DIR, ".workbooks")
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+WORKBOOK_NAME = "Synthetic.xlsx"
+TABLE_PAGE_ROWS = 100
+
+
+# Function to return a synthetic workbook of `n_rows`, generating it only the first time it is asked for
+def synthetic_workbook(n_rows, seed=0):
+    end = default_end_date()
+    path = os.path.join(WORKBOOK_CACHE_DIR, f"nav-{n_rows}-seed{seed}-{end:%Y%m%d}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(WORKBOOK_CACHE_DIR, exist_ok=True)
+        start = time.perf_counter()
+        write_nav_workbook(path + ".tmp", n_rows, seed=seed, end=end)
+        os.replace(path + ".tmp", path)
+        print(f"  generated {os.path.basename(path)} in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    return path
+
+
+# Function to time `func` over `repeat` runs (each after `setup`, which is not timed), then run it
+# once more under tracemalloc for its peak Python memory; returns (stats, last result)
+def measure(func, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    stats = {
+        'best_ms': min(timings) * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'peak_mib': peak / 2**20,
+    }
+    return stats, result
+
+
+# Function to run every stage on one workbook size; must run inside a scratch directory holding NAV/
+def run_size(n_rows, repeat):
+    file_path = os.path.join(WORKBOOK_DIR, WORKBOOK_NAME)
+    shutil.copy2(synthetic_workbook(n_rows), file_path)
+    stages = {}
+
+    def clear_cache():
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def reset_update(scan):
+        clear_ledger(file_path)
+        if os.path.exists(PRICE_STORE_PATH):
+            os.remove(PRICE_STORE_PATH)
+        if scan:
+            clear_cache()
+
+    # Start without pending ledger rows left by the previous size's updater stages
+    reset_update(scan=True)
+
+    stages['load_nav_data (parse)'], _ = measure(lambda: load_nav_data(file_path), repeat, setup=clear_cache)
+    stages['load_nav_data (cached)'], data = measure(lambda: load_nav_data(file_path), repeat)
+    stages['process_excel_data'], stock_blocks = measure(lambda: process_excel_data(data), repeat)
+    stages['load_nav_column'], nav = measure(lambda: load_nav_column(file_path, data), repeat)
+    stages['build_nav_index'], nav_index = measure(lambda: build_nav_index(data, nav), repeat)
+
+    # The table stages run on the "Max" range, the largest table the dashboard builds
+    filtered_data = data.iloc[range_rows(nav_index, "Max")]
+    stages['handle_repeated_dates'], repeated = measure(lambda: handle_repeated_dates(filtered_data), repeat)
+    stages['insert_stock_names_above_data'], table = measure(
+        lambda: insert_stock_names_above_data(stock_blocks, *repeated), repeat
+    )
+    stages['format_table_data (full table)'], _ = measure(lambda: format_table_data(table.copy()), repeat)
+    stages['stock_name_row_mask'], mask = measure(lambda: stock_name_row_mask(table), repeat)
+    stages['render_table_page'], _ = measure(
+        lambda: highlight_rows_with_strings(format_table_data(table.iloc[:TABLE_PAGE_ROWS].copy()), mask[:TABLE_PAGE_ROWS]).to_html(),
+        repeat,
+    )
+
+    # The updater appends the days since the workbook's last date, from a provider that never hits the network
+    last_date = data['Date'].max()
+    provider = StaticPriceProvider(make_closes(last_date.normalize() - pd.Timedelta(days=10), pd.Timestamp.now().normalize() + pd.Timedelta(days=1)))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        stages['modify_workbook (sheet scan)'], _ = measure(
+            lambda: modify_workbook(WORKBOOK_NAME, provider=provider), repeat, setup=lambda: reset_update(True)
+        )
+        stages['modify_workbook (cached scan)'], _ = measure(
+            lambda: modify_workbook(WORKBOOK_NAME, provider=provider), repeat, setup=lambda: reset_update(False)
+        )
+
+    return {'rows': len(data), 'table_rows': len(table), 'blocks': len(stock_blocks), 'stages': stages}
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': {
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'openpyxl': openpyxl.__version__,
+            'pyarrow': pa.__version__,
+        },
+    }
+
+
+# Function to find the most recent saved run, to compare against by default
+def latest_results():
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    return paths[-1] if paths else None
+
+
+def save_results(results):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = results['created'].replace(':', '').replace('-', '')[:15]
+    path = os.path.join(RESULTS_DIR, f"{stamp}-{results['commit'] or 'nocommit'}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def print_results(results, baseline=None):
+    for size, run in results['sizes'].items():
+        print(f"\nrows={size} (table rows={run['table_rows']}, blocks={run['blocks']})")
+        previous = (baseline or {}).get('sizes', {}).get(size, {}).get('stages', {})
+        for name, stats in run['stages'].items():
+            line = f"  {name:32s} {stats['best_ms']:11.1f} ms  {stats['peak_mib']:9.1f} MiB peak"
+            if name in previous:
+                ratio = stats['best_ms'] / previous[name]['best_ms'] if previous[name]['best_ms'] else float('nan')
+                line += f"  {ratio:6.2f}x vs baseline"
+            print(line)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the NAV pipeline on synthetic workbooks.")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="workbook sizes in rows")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (the best is reported)")
+    arg_parser.add_argument("--compare", metavar="RESULTS", help="saved results to compare with (default: the latest)")
+    arg_parser.add_argument("--no-save", action="store_true", help="do not save this run under benchmarks/results/")
+    args = arg_parser.parse_args()
+
+    # Date-format inference and dtype warnings from the pipeline would drown the report
+    warnings.simplefilter("ignore")
+
+    baseline_path = args.compare or latest_results()
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'repeat': args.repeat,
+        'environment': environment(),
+        'sizes': {},
+    }
+
+    repo_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        # The pipeline resolves NAV/, its ledger, the price store and the cache relative to the working directory
+        os.makedirs(os.path.join(scratch, WORKBOOK_DIR))
+        os.chdir(scratch)
+        try:
+            for n_rows in args.sizes:
+                print(f"rows={n_rows} ...", file=sys.stderr)
+                results['sizes'][str(n_rows)] = run_size(n_rows, args.repeat)
+        finally:
+            os.chdir(repo_dir)
+
+    print_results(results, baseline)
+    if baseline_path:
+        print(f"\nbaseline: {os.path.relpath(baseline_path)} (commit {baseline.get('commit')})")
+    if not args.no_save:
+        print(f"saved: {os.path.relpath(save_results(results))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare the iterrows segmenter with the vectorized one on a synthetic workbook.
+
+Run from the repository root:  python -m benchmarks.bench_segmentation [n_rows]
+"""
+import sys
+import time
+
+from benchmarks.synthetic import make_nav_frame
+from date_filtered_nav_dashboard import process_excel_data
+
+
+# The row-by-row implementation process_excel_data used before it was vectorized
+def process_excel_data_iterrows(data):
+    stock_blocks = []
+    current_block = None
+
+    for idx, row in data.iterrows():
+        if isinstance(row['Header'], str) and row['Header'] == 'Stocks':
+            if current_block:
+                current_block['end_idx'] = idx - 1
+                stock_blocks.append(current_block)
+            stock_names = row[['Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5']].tolist()
+            current_block = {'stock_names': stock_names, 'start_idx': idx + 2, 'end_idx': None, 'dates': []}
+
+    if current_block:
+        current_block['end_idx'] = len(data) - 1
+        stock_blocks.append(current_block)
+
+    for block in stock_blocks:
+        block['dates'] = data.iloc[block['start_idx']:block['end_idx'] + 1].dropna(subset=['Date'])['Date'].tolist()
+
+    return stock_blocks
+
+
+def best_of(func, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    data = make_nav_frame(n_rows)
+
+    legacy_time, legacy_blocks = best_of(process_excel_data_iterrows, data, repeat=1)
+    vector_time, vector_blocks = best_of(process_excel_data, data, repeat=5)
+
+    if legacy_blocks != vector_blocks:
+        raise SystemExit("Vectorized segmenter produced different blocks")
+
+    print(f"rows={n_rows} blocks={len(vector_blocks)}")
+    print(f"iterrows   {legacy_time * 1000:10.1f} ms")
+    print(f"vectorized {vector_time * 1000:10.1f} ms  ({legacy_time / vector_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Compare the cell-by-cell sheet scan with the single-pass summary on a synthetic worksheet.
+
+Run from the repository root:  python -m benchmarks.bench_sheet_scan [n_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import openpyxl
+
+from benchmarks.synthetic import make_nav_rows
+from nav_updater import read_sheet_state
+
+
+# The backward/forward cell scans read_sheet_state used before the single-pass rewrite
+def read_sheet_state_by_cell(ws):
+    last_row = ws.max_row
+    while last_row > 1 and ws.cell(row=last_row, column=1).value in (None, ""):
+        last_row -= 1
+
+    last_date = None
+    for row in range(last_row, 1, -1):
+        cell_value = ws.cell(row=row, column=1).value
+        if isinstance(cell_value, datetime):
+            last_date = cell_value
+            break
+
+    last_non_zero_nav = None
+    last_basket_value = None
+    for row in range(last_row, 1, -1):
+        nav_value = ws.cell(row=row, column=10).value
+        basket_value = ws.cell(row=row, column=8).value
+        if isinstance(nav_value, (int, float)) and nav_value != 0:
+            last_non_zero_nav = nav_value
+        if isinstance(basket_value, (int, float)) and basket_value != 0:
+            last_basket_value = basket_value
+        if last_non_zero_nav is not None and last_basket_value is not None:
+            break
+
+    stocks_row = None
+    quantities_row = None
+    for row in range(1, ws.max_row + 1):
+        cell_value = ws.cell(row=row, column=2).value
+        if cell_value == "Stocks":
+            stocks_row = row
+        elif cell_value == "Quantities":
+            quantities_row = row
+
+    stocks = {}
+    quantities = []
+    for col in range(3, 8):
+        stock_symbol = ws.cell(row=stocks_row, column=col).value
+        quantity = ws.cell(row=quantities_row, column=col).value
+        if stock_symbol and isinstance(stock_symbol, str):
+            stocks[stock_symbol] = stock_symbol
+            quantities.append(quantity)
+
+    return {
+        'last_row': last_row,
+        'next_date': last_date + timedelta(days=1),
+        'last_nav': last_non_zero_nav,
+        'last_basket_value': last_basket_value,
+        'stocks': stocks,
+        'quantities': quantities,
+    }
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+    workbook = openpyxl.Workbook()
+    ws = workbook.active
+    for row in make_nav_rows(n_rows):
+        ws.append(row)
+
+    cell_time, by_cell = timed(read_sheet_state_by_cell, ws)
+    pass_time, summary = timed(read_sheet_state, ws, ws.title)
+    if any(summary[key] != value for key, value in by_cell.items()):
+        raise SystemExit("Single-pass summary disagrees with the cell-by-cell scan")
+
+    print(f"rows={n_rows} dates_indexed={len(summary['existing_dates'])}")
+    print(f"sheet scan: cell-by-cell {cell_time * 1000:.1f} ms, single pass {pass_time * 1000:.1f} ms")
+
+    # The duplicate check used to rescan column A once per new date; the summary answers it from a set
+    last_row = summary['last_row']
+    for new_dates in (1, 5, 20, 60):
+        candidates = [(summary['next_date'] + timedelta(days=i)).date() for i in range(new_dates)]
+        rescan_time, _ = timed(lambda: [any(ws.cell(row=r, column=1).value == d for r in range(2, last_row + 1)) for d in candidates])
+        lookup_time, _ = timed(lambda: [d in summary['existing_dates'] for d in candidates])
+        print(
+            f"new_dates={new_dates:3d}  before {(cell_time + rescan_time) * 1000:9.1f} ms"
+            f"  after {(pass_time + lookup_time) * 1000:9.1f} ms"
+        )
+
+    # Unlike cell access, the single pass also works on a read-only (streamed) workbook
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sheet.xlsx")
+        workbook.save(path)
+        full_time, loaded = timed(openpyxl.load_workbook, path)
+        stream_time, _ = timed(lambda: read_sheet_state(openpyxl.load_workbook(path, read_only=True).active, "sheet"))
+    print(f"from disk: full load {full_time * 1000:.0f} ms, read-only load + single pass {stream_time * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import numpy as np
+import openpyxl
+import pandas as pd
+
+NAV_COLUMNS = ['Date', 'Header', 'Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5', 'Basket Value', 'Returns', 'NAV']
+TICKERS = ['INFY.NS', 'HCLTECH.NS', 'TCS.NS', 'WIPRO.NS', 'TECHM.NS', 'KPITTECH.NS', 'MPHASIS.NS', 'LTIM.NS']
+
+# Longest series laid out one business day per date; going further back would leave the range of
+# datetime64[ns] (which starts in 1677), so longer series step by the hour and keep every date distinct
+MAX_BUSINESS_DAYS = 80_000
+
+
+# Function to return the last date of a synthetic series: a few business days ago, so an update
+# appends a handful of rows, as it does on the real workbooks
+def default_end_date():
+    return pd.Timestamp.now().normalize() - pd.offsets.BDay(5)
+
+
+# Function to lay out `n_dates` distinct dates ending on `end`
+def synthetic_dates(n_dates, end=None):
+    end = pd.Timestamp(end) if end is not None else default_end_date()
+    if n_dates <= MAX_BUSINESS_DAYS:
+        return pd.bdate_range(end=end, periods=n_dates)
+    return pd.date_range(end=end, periods=n_dates, freq='h')
+
+
+# Function to generate the rows of a NAV sheet: 'Stocks'/'Quantities' headers, then prices,
+# with the last date of every block repeated as the first date of the next one (a rebalance)
+def make_nav_rows(n_rows, block_size=60, seed=0, end=None):
+    rng = np.random.default_rng(seed)
+    rows = []
+    date_numbers = []  # Position of each data row's date in the series; mapped to dates at the end
+    day = 0
+    nav = 100.0
+    prices = rng.uniform(100, 2000, size=len(TICKERS))
+    previous_basket = None
+
+    while len(rows) < n_rows:
+        picks = rng.choice(len(TICKERS), size=5, replace=False)
+        quantities = rng.integers(1, 30, size=5)
+        rows.append(['Date', 'Stocks', *[TICKERS[p] for p in picks], 'Basket Value', None, 'NAV'])
+        rows.append([None, 'Quantities', *quantities.tolist(), None, None, None])
+
+        for i in range(block_size):
+            if i > 0 or previous_basket is None:
+                prices = prices * (1 + rng.normal(0, 0.01, size=len(TICKERS)))
+            basket = float(prices[picks] @ quantities)
+            if i == 0:
+                # The rebalance row carries the NAV forward but has no return of its own
+                ret = None
+            else:
+                ret = (basket - previous_basket) / previous_basket
+                nav *= 1 + ret
+            date_numbers.append(len(rows))
+            rows.append([day, None, *prices[picks].tolist(), basket, ret, nav])
+            previous_basket = basket
+            if i < block_size - 1:
+                day += 1
+            if len(rows) >= n_rows:
+                break
+
+    rows = rows[:n_rows]
+    date_numbers = [position for position in date_numbers if position < n_rows]
+    if date_numbers:
+        # The last kept row lands on `end`
+        dates = synthetic_dates(rows[date_numbers[-1]][0] + 1, end).to_pydatetime()
+        for position in date_numbers:
+            rows[position][0] = dates[rows[position][0]]
+    return rows
+
+
+# Function to build a frame shaped exactly like load_nav_data's output
+def make_nav_frame(n_rows, block_size=60, seed=0, end=None):
+    data = pd.DataFrame(make_nav_rows(n_rows, block_size, seed, end), columns=NAV_COLUMNS)
+    # Header rows hold the text 'Date' here; blank them first so the column parses in one go
+    data['Date'] = pd.to_datetime(data['Date'].where(data['Header'].isna()), errors='coerce')
+    return data
+
+
+# Function to write a synthetic workbook in the NAV/*.xlsx layout: one sheet, columns A to J, no header
+# row of its own. The shipped workbooks store their dates as text, so by default these do too.
+def write_nav_workbook(path, n_rows, block_size=60, seed=0, end=None, text_dates=True):
+    workbook = openpyxl.Workbook(write_only=True)
+    ws = workbook.create_sheet("Sheet1")
+    for row in make_nav_rows(n_rows, block_size, seed, end):
+        if text_dates and row[1] is None and row[0] is not None:
+            row[0] = row[0].strftime('%Y-%m-%d' if row[0].hour == 0 else '%Y-%m-%d %H:%M:%S')
+        ws.append(row)
+    workbook.save(path)
+
+
+# Function to generate closes for every synthetic ticker over [start, end), for a StaticPriceProvider
+def make_closes(start, end, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+    closes = {}
+    for ticker in TICKERS:
+        path = rng.uniform(100, 2000) * np.cumprod(1 + rng.normal(0, 0.01, size=len(dates)))
+        closes[ticker] = pd.Series(path, index=dates)
+    return closes
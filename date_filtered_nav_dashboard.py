@@ -1,17 +1,17 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
-from datetime import timedelta
 import altair as alt
-import openpyxl
-from openpyxl.styles import NamedStyle
-from datetime import datetime
-import yfinance as yf
-import subprocess
-from openpyxl.utils import get_column_letter # To run git commands
-
-# Define the directory where the workbooks are stored (this is in the same repo)
-WORKBOOK_DIR = "NAV"  # Folder where the Excel workbooks are stored
+from nav_analytics import block_attribution, performance_summary, rolling_metrics
+from nav_cache import load_cached_tables, load_cached_workbook
+from nav_compare import create_loader_pool, load_nav_series_parallel, rebased_comparison
+from nav_downsample import CHART_POINT_BUDGET, downsample_chart_data
+from nav_ledger import read_ledger_frame, workbook_version
+from nav_memo import PipelineMemo
+from nav_timing import stage, start_recording, stop_recording
+# Workbooks are refreshed by nav_updater.py on its own schedule; the dashboard only reads them
+from nav_updater import WORKBOOK_DIR, read_update_marker
 
 # Function to list available Excel files in the specified directory
 def list_workbooks(directory):
@@ -26,13 +26,13 @@ def list_workbooks(directory):
 # Function to load NAV data from the selected workbook
 def load_nav_data(file_path):
     try:
-        # Load full sheet data without limiting columns and headers
-        data = pd.read_excel(file_path, sheet_name=0, header=None)
-        data.columns = ['Date', 'Header', 'Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5', 'Basket Value', 'Returns', 'NAV']
-        
-        # Ensure 'Date' column is datetime; coerce errors to handle non-date values
-        data['Date'] = pd.to_datetime(data['Date'], errors='coerce')
-        
+        # Served from the columnar cache unless the workbook changed since it was last parsed
+        data = load_cached_workbook(file_path)
+
+        # Rows the updater appended to the ledger but has not exported into the workbook yet
+        pending = read_ledger_frame(file_path)
+        if not pending.empty:
+            data = pd.concat([data, pending.astype(data.dtypes.to_dict())], ignore_index=True)
 
         # Check if required columns are present
         if 'NAV' not in data.columns or 'Date' not in data.columns:
@@ -44,49 +44,127 @@ def load_nav_data(file_path):
         st.error(f"Error reading Excel file: {e}")
         return pd.DataFrame()
 
-# Function to filter data based on the selected date range
-def filter_data_by_date(data, date_range):
+# Lookback of the calendar-based ranges; "1 Day" and "5 Days" are the last rows, "Max" is everything
+RANGE_LOOKBACK_DAYS = {"1 Month": 30, "6 Months": 180, "1 Year": 365}
+
+# Function to precompute what every range switch needs: dated rows sorted by date, the start offset of
+# each calendar range (via searchsorted), and `nav`, the NAV column as floats (see load_nav_column)
+def build_nav_index(data, nav=None):
+    dated_rows = np.flatnonzero(data['Date'].notna().to_numpy())
+    dates = data['Date'].to_numpy()[dated_rows]
+    in_order = bool(np.all(dates[1:] >= dates[:-1]))
+    if not in_order:
+        order = np.argsort(dates, kind='stable')
+        dated_rows, dates = dated_rows[order], dates[order]
+
+    offsets = {}
+    if len(dates):
+        for name, days in RANGE_LOOKBACK_DAYS.items():
+            offsets[name] = int(np.searchsorted(dates, dates[-1] - np.timedelta64(days, 'D'), side='left'))
+
+    return {
+        'n_rows': len(data),
+        'dated_rows': dated_rows,
+        'dates': dates,
+        'in_order': in_order,
+        'offsets': offsets,
+        'nav': nav,
+    }
+
+STOCK_COLUMNS = ['Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5']
+
+# Function to return value columns of load_nav_data's frame as a float64 (rows x columns) matrix, taken from
+# the typed price table rather than coerced from the displayed columns (which also hold the stock names)
+def load_value_columns(file_path, data, columns):
+    values_table, labels_table = load_cached_tables(file_path)
+    workbook_rows = values_table.num_rows + labels_table.num_rows
+    matrix = np.full((len(data), len(columns)), np.nan)
+    value_rows = values_table.column('row').to_numpy()
+    for j, col in enumerate(columns):
+        matrix[value_rows, j] = values_table.column(col).to_numpy()
+    # Rows past the workbook's are the ledger's pending rows, whose values were computed as floats
+    matrix[workbook_rows:] = data[columns].to_numpy()[workbook_rows:].astype(float)
+    return matrix
+
+# Function to return the NAV column of load_nav_data's frame as float64 (see load_value_columns)
+def load_nav_column(file_path, data):
+    return load_value_columns(file_path, data, ['NAV'])[:, 0]
+
+# Function to return the row positions of a date range, as a slice where the rows are contiguous so
+# selecting them does not copy the frame; "Custom" takes an inclusive start/end date
+def range_rows(nav_index, date_range, start=None, end=None):
+    n_rows = nav_index['n_rows']
     if date_range == "1 Day":
-        return data.tail(1)
+        return slice(max(n_rows - 1, 0), n_rows)
     elif date_range == "5 Days":
-        return data.tail(5)
-    elif date_range == "1 Month":
-        one_month_ago = data['Date'].max() - timedelta(days=30)
-        return data[data['Date'] >= one_month_ago]
-    elif date_range == "6 Months":
-        six_months_ago = data['Date'].max() - timedelta(days=180)
-        return data[data['Date'] >= six_months_ago]
-    elif date_range == "1 Year":
-        one_year_ago = data['Date'].max() - timedelta(days=365)
-        return data[data['Date'] >= one_year_ago]
-    else:  # Max
-        return data
-
-# Function to process Excel data and identify stock name changes dynamically
-def process_excel_data(data):
-    stock_blocks = []
-    current_block = None
+        return slice(max(n_rows - 5, 0), n_rows)
+    elif date_range == "Max":
+        return slice(0, n_rows)
+
+    dates = nav_index['dates']
+    if date_range == "Custom":
+        lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side='left')
+        hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side='right')
+    else:
+        lo, hi = nav_index['offsets'].get(date_range, 0), len(dates)
 
-    # Iterate through the rows of the DataFrame to detect stock changes
-    for idx, row in data.iterrows():
-        if isinstance(row['Header'], str) and row['Header'] == 'Stocks':  # Detect when stock names change
-            if current_block:
-                current_block['end_idx'] = idx - 1  # End the current block before the next 'Stocks' row
-                stock_blocks.append(current_block)  # Save the completed block
+    rows = nav_index['dated_rows'][lo:hi]
+    # Keep the workbook's row order if the index had to sort dates
+    return rows if nav_index['in_order'] else np.sort(rows)
 
-            # Create a new block
-            stock_names = row[['Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5']].tolist()  # Get stock names from columns C to G
-            current_block = {'stock_names': stock_names, 'start_idx': idx + 2, 'end_idx': None, 'dates': []}  # Include dates
-           
+# Function to filter data based on the selected date range
+def filter_data_by_date(data, date_range, nav_index=None, start=None, end=None):
+    if nav_index is None:
+        nav_index = build_nav_index(data)
+    return data.iloc[range_rows(nav_index, date_range, start, end)]
+
+# Function to locate every stock block in a single vectorized pass over the 'Header' column
+def segment_stock_blocks(data):
+    n_rows = len(data)
+    stock_rows = np.flatnonzero(data['Header'].to_numpy() == 'Stocks')
+
+    # Each 'Stocks' row opens a block; its data starts after the 'Quantities' row and ends before the next block
+    start_idx = stock_rows + 2
+    end_idx = np.append(stock_rows[1:] - 1, n_rows - 1).astype(np.int64)[:len(stock_rows)]
+    stock_names = data[['Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5']].to_numpy()[stock_rows]
+
+    # Dated rows are sorted by position, so each block's dates are one contiguous run of date_rows
+    dates = data['Date'].to_numpy()
+    date_rows = np.flatnonzero(~pd.isna(dates))
+    date_start = np.searchsorted(date_rows, start_idx, side='left')
+    date_end = np.maximum(np.searchsorted(date_rows, end_idx, side='right'), date_start)
+
+    has_dates = date_end > date_start
+    first_date = np.full(len(stock_rows), np.datetime64('NaT'), dtype='datetime64[ns]')
+    last_date = first_date.copy()
+    first_date[has_dates] = dates[date_rows[date_start[has_dates]]]
+    last_date[has_dates] = dates[date_rows[date_end[has_dates] - 1]]
+
+    return {
+        'start_idx': start_idx,
+        'end_idx': end_idx,
+        'stock_names': stock_names,
+        'first_date': first_date,
+        'last_date': last_date,
+        'date_rows': date_rows,
+        'date_start': date_start,
+        'date_end': date_end,
+    }
 
-    if current_block:
-        current_block['end_idx'] = len(data) - 1  # Handle the last block until the end of the dataset
-        stock_blocks.append(current_block)
+# Function to process Excel data and identify stock name changes dynamically
+def process_excel_data(data):
+    block_index = segment_stock_blocks(data)
+    # Convert the dated rows to Timestamps once; each block then takes a plain list slice
+    all_dates = data['Date'].iloc[block_index['date_rows']].tolist()
 
-    # Add dates to each stock block
-    for block in stock_blocks:
-        block['dates'] = data.iloc[block['start_idx']:block['end_idx'] + 1].dropna(subset=['Date'])['Date'].tolist()
-        
+    stock_blocks = []
+    for k in range(len(block_index['start_idx'])):
+        stock_blocks.append({
+            'stock_names': block_index['stock_names'][k].tolist(),
+            'start_idx': int(block_index['start_idx'][k]),
+            'end_idx': int(block_index['end_idx'][k]),
+            'dates': all_dates[block_index['date_start'][k]:block_index['date_end'][k]],
+        })
 
     return stock_blocks
 
@@ -106,286 +184,220 @@ def handle_repeated_dates(filtered_data):
 
     return updated_filtered_data, repeated_dates, first_instances, second_instances
 
+# Function to group row positions by date (as int64 nanoseconds) so lookups never rescan the frame
+def rows_by_date(data):
+    positions = {}
+    nat = np.iinfo(np.int64).min  # How NaT is stored as int64
+    for pos, date in enumerate(data['Date'].to_numpy(dtype='datetime64[ns]').view(np.int64).tolist()):
+        if date != nat:
+            positions.setdefault(date, []).append(pos)
+    return positions
+
+# Function to build one stock-names separator row per block, typed like the data it is inserted into
+def stock_name_rows(stock_blocks, columns, dtypes):
+    n_blocks = len(stock_blocks)
+    names = {}
+    for col in columns:
+        if dtypes[col] == object:
+            names[col] = np.full(n_blocks, None, dtype=object)
+        else:
+            names[col] = pd.Series(np.nan, index=range(n_blocks)).astype(dtypes[col])
+    for i in range(5):
+        names[f'Stock{i + 1}'] = np.array([block['stock_names'][i] for block in stock_blocks], dtype=object)
+    return pd.DataFrame(names, columns=columns)
+
 def insert_stock_names_above_data(stock_blocks, filtered_data, repeated_dates, first_instances, second_instances):
-    final_data = pd.DataFrame()
+    if not stock_blocks or filtered_data.empty:
+        return pd.DataFrame()
 
-    filtered_dates = filtered_data['Date'].tolist()
+    data_rows = rows_by_date(filtered_data)
+    first_rows = rows_by_date(first_instances)
+    repeated = set(pd.DatetimeIndex(repeated_dates).asi8.tolist())
     used_dates = set()  # To keep track of used dates and avoid duplicates
-    stock_inserted = False  # Track whether stock names for a block were already inserted
-
-    for block in stock_blocks:
-        overlap_dates = [date for date in block['dates'] if date in filtered_dates]
-
-        if overlap_dates:
-            # Insert stock names for the block above the first relevant date
-            if not stock_inserted:  # Ensure stock names are only inserted once per block
-                stock_names_row = pd.DataFrame([[None] * len(filtered_data.columns)], columns=filtered_data.columns)
-                for i, stock_name in enumerate(block['stock_names']):
-                    stock_names_row[f'Stock{i + 1}'] = stock_name
-
-                final_data = pd.concat([final_data, stock_names_row], ignore_index=True)
-                stock_inserted = True
-
-            for date in overlap_dates:
-                if date in repeated_dates:
-                    # Insert the first instance of the repeated date (Returns has a value)
-                    if date not in used_dates:
-                        first_instance = first_instances[first_instances['Date'] == date]
-                        final_data = pd.concat([final_data, first_instance], ignore_index=True)
-                        used_dates.add(date)
-
-                    # Insert stock names for the new block and then the second instance
-                    if date in second_instances['Date'].values and date not in used_dates:
-                        # Insert new stock block names above the second instance
-                        stock_names_row_new_block = pd.DataFrame([[None] * len(filtered_data.columns)], columns=filtered_data.columns)
-                        for i, stock_name in enumerate(block['stock_names']):
-                            stock_names_row_new_block[f'Stock{i + 1}'] = stock_name
-
-                        final_data = pd.concat([final_data, stock_names_row_new_block], ignore_index=True)
-
-                        # Insert the second instance (Returns is None) into the new block
-                        second_instance = second_instances[second_instances['Date'] == date]
-                        final_data = pd.concat([final_data, second_instance], ignore_index=True)
-                        used_dates.add(date)
-
-                elif date not in used_dates:
-                    # Normal case: non-repeated dates
-                    block_data = filtered_data[filtered_data['Date'] == date]
-                    final_data = pd.concat([final_data, block_data], ignore_index=True)
-                    used_dates.add(date)
-
-        # Reset the flag for the next block
-        stock_inserted = False
-
-    return final_data
-
-
-# Function to recalculate NAV starting from 100
-def recalculate_nav(filtered_data):
-    initial_nav = filtered_data['NAV'].iloc[0]
-    filtered_data['Rebased NAV'] = (filtered_data['NAV'] / initial_nav) * 100
-    return filtered_data
 
-# Function to modify all Excel files in the directory and push them to GitHub
-def modify_all_workbooks_and_push_to_github():
-    workbooks = list_workbooks(WORKBOOK_DIR)
-    if not workbooks:
-        st.error("No workbooks found to modify.")
-        return
+    # Every output row is a (source, position) pair; the frame is materialized with one concat and one take
+    first_offset = len(filtered_data)
+    names_offset = first_offset + len(first_instances)
+    plan = []
 
-    modified_files = []
+    for k, block in enumerate(stock_blocks):
+        overlap_dates = [date.value for date in block['dates'] if date.value in data_rows]
+        if not overlap_dates:
+            continue
 
-    for filename in workbooks:
-        try:
-            modify_workbook(filename)
-            modified_files.append(filename)
-        except Exception as e:
-            st.error(f"Error modifying {filename}: {e}")
+        # Insert stock names for the block above the first relevant date
+        plan.append(names_offset + k)
 
-    # Push all modified files to GitHub
-    if modified_files:
-        git_add_commit_push(modified_files)
+        for date in overlap_dates:
+            if date in used_dates:
+                continue
+            used_dates.add(date)
+            if date in repeated:
+                # A rebalance date is shown once, as the closing row (Returns has a value) of the earlier
+                # block; the second instance is covered by the next block's stock names row
+                plan.extend(first_offset + pos for pos in first_rows.get(date, []))
+            else:
+                # Normal case: non-repeated dates
+                plan.extend(data_rows[date])
+
+    if not plan:
+        return pd.DataFrame()
 
-# Function to modify a single Excel workbook
-def modify_workbook(filename):
-    file_path = os.path.join(WORKBOOK_DIR, filename)
-    try:
-        workbook = openpyxl.load_workbook(file_path)
+    columns = filtered_data.columns
+    names = stock_name_rows(stock_blocks, columns, filtered_data.dtypes)
+    source = pd.concat([filtered_data, first_instances[columns], names], ignore_index=True)
+    return source.take(plan).reset_index(drop=True)
 
-        # Create a style for date formatting
-        date_style = NamedStyle(name="datetime", number_format='yyyy-mm-dd')
-        
-        if "datetime" not in workbook.named_styles:
-            workbook.add_named_style(date_style)
-    
-        for sheet_name in workbook.sheetnames:
-            ws = workbook[sheet_name]
-            print(f"Modifying sheet: {sheet_name}")
-
-            # Step 1: Find the actual last row with data in the worksheet
-            last_row = ws.max_row
-            while last_row > 1 and ws.cell(row=last_row, column=1).value in (None, ""):
-                last_row -= 1
-
-            # Step 2: Determine the next date to add
-            last_date = None
-            for row in range(last_row, 1, -1):
-                cell_value = ws.cell(row=row, column=1).value
-                if isinstance(cell_value, datetime):
-                    last_date = cell_value
-                    break
-                elif isinstance(cell_value, str):
-                    try:
-                        last_date = parser.parse(cell_value)
-                        break
-                    except ValueError:
-                        continue  # Skip rows that cannot be parsed as a date
-
-            if last_date is None:
-                # If no valid date is found, set a fallback date
-                last_date = datetime.now() - timedelta(days=1)
-
-            next_date = last_date + timedelta(days=1)
-
-            # Step 3: Identify the last non-zero NAV in column J (NAV) and the last valid basket value
-            nav_column_index = 10
-            basket_value_column_index = 8
-            last_non_zero_nav = None
-            last_basket_value = None
-
-            for row in range(last_row, 1, -1):
-                nav_value = ws.cell(row=row, column=nav_column_index).value
-                basket_value = ws.cell(row=row, column=basket_value_column_index).value
-                
-                if isinstance(nav_value, (int, float)) and nav_value != 0:
-                    last_non_zero_nav = nav_value
-                
-                if isinstance(basket_value, (int, float)) and basket_value != 0:
-                    last_basket_value = basket_value
-
-                # If both the NAV and basket value are found, break the loop
-                if last_non_zero_nav is not None and last_basket_value is not None:
-                    break
-
-            if last_non_zero_nav is None:
-                last_non_zero_nav = 100  # Default initial NAV
-
-            if last_basket_value is None:
-                st.warning("No previous basket value found, setting to 100")
-                last_basket_value = 100  # Default basket value in case none is found
-
-            # Step 4: Identify existing stock symbols and quantities in columns C to G
-            stocks_row = None
-            quantities_row = None
-
-            for row in range(1, ws.max_row + 1):
-                cell_value = ws.cell(row=row, column=2).value
-                if cell_value == "Stocks":
-                    stocks_row = row
-                elif cell_value == "Quantities":
-                    quantities_row = row
-
-            if not stocks_row or not quantities_row:
-                print(f"Could not find 'Stocks' or 'Quantities' headers in sheet {sheet_name}. Skipping sheet.")
-                continue
 
-            stocks = {}
-            quantities = []
-
-            for col in range(3, 8):
-                stock_symbol = ws.cell(row=stocks_row, column=col).value
-                quantity = ws.cell(row=quantities_row, column=col).value
-                if stock_symbol and isinstance(stock_symbol, str):
-                    stocks[stock_symbol] = stock_symbol
-                    quantities.append(quantity)
-
-            # Step 5: Fetch historical stock data
-            today_date = datetime.now().strftime('%Y-%m-%d')
-            next_date_str = next_date.strftime('%Y-%m-%d')
-
-            all_prices = {}
-            for stock_symbol in stocks.keys():
-                ticker = yf.Ticker(stock_symbol)
-
-                try:
-                    hist = ticker.history(start=next_date_str, end=today_date, interval="1d", auto_adjust=False)
-                    if hist.empty:
-                        print(f"No data found for {stock_symbol}. Skipping.")
-                        continue
-
-                    closing_prices = hist['Close'].tolist()
-                    closing_dates = hist.index.strftime('%Y-%m-%d').tolist()
-                    all_prices[stock_symbol] = (closing_dates, closing_prices)
-
-                except Exception as e:
-                    print(f"Error fetching data for {stock_symbol}: {e}")
-                    continue
-
-            # Step 6: Insert the fetched data and perform calculations
-            basket_values = []
-            returns = []
-            nav_values = [last_non_zero_nav]
-
-            for i in range(len(closing_dates)):
-                # Convert the current date to datetime.date for comparison
-                current_date = datetime.strptime(closing_dates[i], '%Y-%m-%d').date()
-
-                # Check if the date already exists in the worksheet
-                if any(ws.cell(row=r, column=1).value == current_date for r in range(2, last_row + 1)):
-                    print(f"Date {current_date} already exists. Skipping.")
-                    continue
-
-                current_row = last_row + 1  # Add data to the immediate next row after the last data row
-                last_row += 1
-
-                # Insert date
-                date_value = datetime.strptime(closing_dates[i], '%Y-%m-%d')
-                date_cell = ws.cell(row=current_row, column=1, value=date_value)
-                date_cell.number_format = 'yyyy-mm-dd'  # Apply the date style to the cell
-
-                # Calculate basket value for the current date
-                basket_value = 0
-                for j, stock_symbol in enumerate(stocks.keys()):
-                    price = all_prices[stock_symbol][1][i] if i < len(all_prices[stock_symbol][1]) else 0
-                    quantity = quantities[j]
-                    basket_value += price * quantity
-                    ws.cell(row=current_row, column=3 + j, value=price)  # Insert price starting from column C
-
-                # Insert basket value in column H
-                ws.cell(row=current_row, column=8, value=basket_value)
-                basket_values.append(basket_value)
-
-                # Calculate returns based on the previous basket value
-                if i == 0 and last_basket_value != 0:
-                    ret = (basket_value - last_basket_value) / last_basket_value
-                elif i > 0 and basket_values[i - 1] != 0:
-                    ret = (basket_value - basket_values[i - 1]) / basket_values[i - 1]
-                else:
-                    ret = 0  # In case of divide by zero or missing data
-
-                returns.append(ret)
-                ws.cell(row=current_row, column=9, value=ret)
-
-                # Calculate NAV based on the previous NAV and return
-                nav = nav_values[-1] * (1 + ret)
-                nav_values.append(nav)
-                ws.cell(row=current_row, column=10, value=nav)
-
-        workbook.save(file_path)
+# Function to recalculate NAV starting from 100; `nav_values` are the rows' NAVs as floats (nav_index['nav'])
+def recalculate_nav(filtered_data, nav_values):
+    filtered_data['Rebased NAV'] = (nav_values / nav_values[0]) * 100
+    return filtered_data
 
-    except Exception as e:
-        print(f"Error modifying {filename}: {e}")
+# Function to return the workbook's range index, built once per workbook version and shared by all sessions
+@st.cache_resource(max_entries=32)
+def cached_nav_index(file_path, version, _data):
+    return build_nav_index(_data, load_nav_column(file_path, _data))
+
+# Function to compute the full-history performance metrics of a workbook, once per workbook version
+@st.cache_resource(max_entries=32)
+def cached_performance(file_path, version, _data, _nav_index):
+    # A rebalance date appears twice with the same NAV; keep the first and drop header rows
+    nav = _nav_index['nav'][_nav_index['dated_rows']]
+    keep = ~np.isnan(nav)
+    dates, first = np.unique(_nav_index['dates'][keep], return_index=True)
+    nav = nav[keep][first]
+    if len(dates) < 2:
+        return None
+
+    prices = load_value_columns(file_path, _data, STOCK_COLUMNS)
+    summary, attribution = block_attribution(_data, segment_stock_blocks(_data), prices, _nav_index['nav'])
+    return {
+        'summary': performance_summary(dates, nav),
+        'rolling': rolling_metrics(dates, nav),
+        'blocks': summary,
+        'attribution': attribution,
+    }
+
+# Function to show the performance metrics panel: headline figures, trailing returns, rolling
+# volatility/Sharpe/drawdown and the return of each rebalance block split by stock
+def performance_panel(performance):
+    if performance is None:
+        st.info("Not enough NAV history to compute performance metrics.")
+        return
 
-# Function to execute git commands to add, commit, and push changes
-def git_add_commit_push(modified_files):
-    try:
-        # Git add each modified file
-        for filename in modified_files:
-            subprocess.run(["git", "add", f"{WORKBOOK_DIR}/{filename}"], check=True)
-
-        # Check if there are changes to commit
-        status_result = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True, check=True)
-        
-        # If there are no changes, return without committing
-        if not status_result.stdout.strip():
-            st.warning("No changes to commit.")
-            return
+    summary = performance['summary']
+    columns = st.columns(4)
+    columns[0].metric("CAGR", f"{summary['cagr']:.2%}")
+    columns[1].metric("Annualized volatility", f"{summary['volatility']:.2%}")
+    columns[2].metric("Sharpe ratio", f"{summary['sharpe']:.2f}")
+    columns[3].metric("Max drawdown", f"{summary['max_drawdown']:.2%}")
+    st.caption(
+        f"Max drawdown from {summary['peak_date']:%Y-%m-%d} to {summary['trough_date']:%Y-%m-%d}"
+    )
+
+    trailing = pd.DataFrame([summary['trailing_returns']], index=["Return"])
+    st.dataframe(trailing.style.format("{:.2%}", na_rep="-"))
+
+    rolling = performance['rolling'].melt('Date', ['Rolling Volatility', 'Rolling Sharpe', 'Drawdown'], 'Metric', 'Value')
+    rolling_chart = alt.Chart(rolling.dropna()).mark_line().encode(
+        x='Date:T',
+        y=alt.Y('Value:Q', title=None),
+        tooltip=['Date:T', 'Metric:N', 'Value:Q']
+    ).properties(
+        width=220,
+        height=200
+    ).facet(
+        column='Metric:N'
+    ).resolve_scale(y='independent')
+    st.altair_chart(rolling_chart)
+
+    st.write("#### Rebalance blocks")
+    st.dataframe(performance['blocks'].style.format({'Start': '{:%Y-%m-%d}', 'End': '{:%Y-%m-%d}', 'Block Return': '{:.2%}'}), hide_index=True)
+    with st.expander("Attribution by stock"):
+        st.dataframe(performance['attribution'].style.format({'Contribution': '{:.2%}'}, precision=2), hide_index=True)
+
+# Function to return the memo of loaded frames, stock blocks, table pages and compared NAV series shared by all sessions
+@st.cache_resource
+def pipeline_memo():
+    return PipelineMemo()
+
+# Function to show the memo's hit/miss counters and memory use in the sidebar
+def show_memo_stats(memo):
+    stats = memo.stats()
+    with st.sidebar.expander("Cache statistics"):
+        st.write(
+            f"{stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+            f"{stats['evictions']} evictions"
+        )
+        st.write(f"{stats['entries']} entries, {stats['bytes'] / 2**20:.1f} of {stats['max_bytes'] / 2**20:.0f} MiB")
+
+# Function to return the process pool that parses workbooks for the comparison view, shared by all sessions
+@st.cache_resource
+def workbook_loader_pool():
+    return create_loader_pool()
+
+# Function to load the NAV series of several workbooks, parsing only those not memoized yet, in parallel.
+# The series live in the shared pipeline memo, which locks around every lookup and drops older versions.
+def load_compared_series(file_paths):
+    memo = pipeline_memo()
+    versions = {file_path: workbook_version(file_path) for file_path in file_paths}
+
+    series = {file_path: memo.get(file_path, version, 'nav_series') for file_path, version in versions.items()}
+    missing = [file_path for file_path, value in series.items() if value is None]
+    if missing:
+        for file_path, value in load_nav_series_parallel(missing, workbook_loader_pool()).items():
+            memo.put(file_path, versions[file_path], 'nav_series', value=value)
+            series[file_path] = value
+
+    return series
+
+# Function to read the chart point budget from the sidebar; None draws every point
+def chart_point_budget():
+    if st.sidebar.checkbox("Full-resolution charts", value=False):
+        return None
+    return int(st.sidebar.number_input("Chart points per line", min_value=100, value=CHART_POINT_BUDGET, step=100))
+
+# Function to overlay the rebased NAVs of several workbooks in one chart
+def compare_workbooks_view(workbooks, max_points=CHART_POINT_BUDGET):
+    selected_workbooks = st.multiselect("Workbooks to compare", workbooks, default=workbooks)
+    if not selected_workbooks:
+        st.info("Select at least one workbook to compare.")
+        return
 
-        # Git commit with a single message for all files
-        commit_message = f"Updated {', '.join(modified_files)} with new data"
-        subprocess.run(["git", "commit", "-m", commit_message], check=True)
+    compare_ranges = ["1 Month", "6 Months", "1 Year", "Max"]
+    selected_range = st.selectbox("Select Date Range", compare_ranges, index=len(compare_ranges) - 1)
 
-        # Git push to the remote repository
-        subprocess.run(["git", "push"], check=True)
+    file_paths = {name: os.path.join(WORKBOOK_DIR, name) for name in selected_workbooks}
+    loaded = load_compared_series(list(file_paths.values()))
+    series = {os.path.splitext(name)[0]: loaded[path] for name, path in file_paths.items() if len(loaded[path][0])}
+    if not series:
+        st.error("No NAV data found in the selected workbooks.")
+        return
 
-    except subprocess.CalledProcessError as e:
-        print(f"Error during git operation: {e}")
+    # All baskets share one window, ending at the latest date any of them has
+    start = None
+    if selected_range != "Max":
+        last_date = max(dates[-1] for dates, _ in series.values())
+        start = last_date - np.timedelta64(RANGE_LOOKBACK_DAYS[selected_range], 'D')
+    comparison = rebased_comparison(series, start)
+    if max_points is not None:
+        comparison = downsample_chart_data(comparison, 'Date', 'Rebased NAV', max_points, by='Workbook')
+
+    comparison_chart = alt.Chart(comparison).mark_line().encode(
+        x='Date:T',
+        y=alt.Y('Rebased NAV:Q', scale=alt.Scale(zero=False)),
+        color='Workbook:N',
+        tooltip=['Date:T', 'Workbook:N', 'Rebased NAV:Q']
+    ).properties(
+        width=700,
+        height=400
+    )
+    st.write("### Rebased NAV comparison")
+    st.altair_chart(comparison_chart, use_container_width=True)
 
 def clean_chart_data(filtered_data, chart_column):
-    # Convert the chart_column to numeric, replacing non-numeric values with NaN
-    filtered_data[chart_column] = pd.to_numeric(filtered_data[chart_column], errors='coerce')
-    
-    # Drop rows where the chart_column is NaN
+    # The chart column is built from float arrays (nav_index['nav']); drop rows where it is NaN
     clean_data = filtered_data.dropna(subset=[chart_column])
     return clean_data
 
@@ -393,7 +405,8 @@ def format_table_data(data):
     if 'Header' in data.columns:
         data = data.drop(columns=['Header'])
 
-    # Round numeric columns to 2 decimal places
+    # Round numeric columns to 2 decimal places. The displayed table keeps stock names in the price
+    # columns, so only this page's cells are parsed; nothing else reads numbers from the object frame
     for col in ['Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5', 'Basket Value', 'Returns', 'NAV']:
         data[col] = pd.to_numeric(data[col], errors='coerce').round(3).fillna(data[col])
     # Format date to exclude time
@@ -401,20 +414,65 @@ def format_table_data(data):
    
     return data
 
-def highlight_rows_with_strings(df):
-    def highlight_row(row):
-        # Check if any value in the Stock1-Stock5 columns is a string
-        if any(isinstance(row[col], str) for col in ['Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5']):
-            return ['background-color: yellow'] * len(row)
-        else:
-            return [''] * len(row)
-
-    return df.style.apply(highlight_row, axis=1)
+# Function to flag the rows of the stock data table showing stock names. The table holds dated price rows
+# and the undated name rows insert_stock_names_above_data adds, so no cell has to be parsed
+def stock_name_row_mask(data):
+    return (data['Date'].isna() & data[STOCK_COLUMNS].notna().any(axis=1)).to_numpy()
+
+def highlight_rows_with_strings(df, mask=None):
+    if mask is None:
+        mask = stock_name_row_mask(df)
+    # One style table for the whole frame instead of a Python callback per row
+    styles = np.where(np.asarray(mask)[:, None], 'background-color: yellow', '')
+    styles = pd.DataFrame(np.broadcast_to(styles, df.shape), index=df.index, columns=df.columns)
+    return df.style.apply(lambda _: styles, axis=None)
+
+TABLE_PAGE_SIZES = [50, 100, 250, 500]
+
+# Function to show the table one page at a time; only the visible page is formatted and styled,
+# so the cost of a rerun does not grow with the length of the history
+def show_table_page(table, mask=None):
+    if mask is None:
+        mask = stock_name_row_mask(table)
+
+    page_size = st.selectbox("Rows per page", TABLE_PAGE_SIZES, index=1)
+    n_pages = max(-(-len(table) // page_size), 1)
+    page = int(st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1))
+    rows = slice((page - 1) * page_size, min(page * page_size, len(table)))
+    st.caption(f"Rows {rows.start + 1}-{rows.stop} of {len(table)} (page {page} of {n_pages})")
+
+    with stage("render_table_page", rows=rows.stop - rows.start):
+        page_data = format_table_data(table.iloc[rows].copy())
+        st.dataframe(highlight_rows_with_strings(page_data, mask[rows]))
+
+# Function to run the app, showing a breakdown of where this rerun's time went when the sidebar asks for it
+def run_with_timings(app):
+    if not st.sidebar.checkbox("Show stage timings", value=False):
+        app()
+        return
 
+    recorder = start_recording()
+    try:
+        app()
+    finally:
+        stop_recording()
+        total_ms = recorder.total_ms()
+        with st.sidebar.expander("Stage timings", expanded=True):
+            if recorder.records:
+                timings = pd.DataFrame(recorder.records)
+                # Nested stages are indented under the stage that contains them
+                timings['stage'] = ['\u2003' * depth + name for depth, name in zip(timings.pop('depth'), timings['stage'])]
+                st.dataframe(timings, hide_index=True)
+            st.caption(f"Rerun took {total_ms:.1f} ms")
 
 def main():
     st.title("NAV Data Dashboard")
-    modify_all_workbooks_and_push_to_github()
+
+    marker = read_update_marker()
+    if marker:
+        st.caption(f"Data last updated {marker['updated_at']} (trading day {marker['trading_day']})")
+    else:
+        st.caption("Data has not been refreshed by the updater yet.")
 
     # List available workbooks in the directory
     workbooks = list_workbooks(WORKBOOK_DIR)
@@ -423,64 +481,121 @@ def main():
         st.error("No Excel workbooks found in the specified directory.")
         return
 
+    view = st.radio("View", ["Single workbook", "Compare workbooks"], horizontal=True)
+    if view == "Compare workbooks":
+        compare_workbooks_view(workbooks, chart_point_budget())
+        return
+
     # Display the data for a specific workbook (example: the first one)
     selected_workbook = st.selectbox("Select a workbook", workbooks)
     
     file_path = os.path.join(WORKBOOK_DIR, selected_workbook)
 
-    nav_data = load_nav_data(file_path)
+    # Results are memoized per workbook version, so reruns skip work done by any session since the last update
+    version = workbook_version(file_path)
+    memo = pipeline_memo()
+    nav_data = memo.get(file_path, version, 'nav_data')
+    if nav_data is None:
+        with stage("load_nav_data") as timing:
+            nav_data = load_nav_data(file_path)
+            timing.count(rows=len(nav_data))
+        if not nav_data.empty:
+            memo.put(file_path, version, 'nav_data', value=nav_data)
 
     if not nav_data.empty:
         # Process the Excel data and detect stock name changes, including block dates
-        stock_blocks = process_excel_data(nav_data)
+        stock_blocks = memo.get(file_path, version, 'stock_blocks')
+        if stock_blocks is None:
+            with stage("process_excel_data") as timing:
+                stock_blocks = process_excel_data(nav_data)
+                timing.count(blocks=len(stock_blocks))
+            memo.put(file_path, version, 'stock_blocks', value=stock_blocks)
 
         if not stock_blocks:
             st.error("No valid stock data found in the workbook.")
             return
 
+        nav_index = cached_nav_index(file_path, version, nav_data)
+
         # Allow the user to select a date range
-        date_ranges = ["1 Day", "5 Days", "1 Month", "6 Months", "1 Year", "Max"]
+        date_ranges = ["1 Day", "5 Days", "1 Month", "6 Months", "1 Year", "Max", "Custom"]
         selected_range = st.selectbox("Select Date Range", date_ranges)
 
+        start_date = end_date = None
+        if selected_range == "Custom":
+            first_date, last_date = pd.Timestamp(nav_index['dates'][0]).date(), pd.Timestamp(nav_index['dates'][-1]).date()
+            custom_range = st.date_input("Select dates", (first_date, last_date), min_value=first_date, max_value=last_date)
+            if len(custom_range) != 2:
+                st.info("Select an end date.")
+                return
+            start_date, end_date = custom_range
+
         # Filter the nav_data by the selected date range
-        filtered_data = filter_data_by_date(nav_data, selected_range)
+        rows = range_rows(nav_index, selected_range, start_date, end_date)
+        filtered_data = nav_data.iloc[rows]
+        nav_values = nav_index['nav'][rows]
+        if filtered_data.empty:
+            st.warning("No data in the selected date range.")
+            return
         if selected_range not in ["1 Day", "Max"]:
-            filtered_data = recalculate_nav(filtered_data)
+            filtered_data = recalculate_nav(filtered_data.copy(), nav_values)
             chart_column = 'Rebased NAV'
+            chart_values = filtered_data[chart_column].to_numpy()
         else:
             chart_column = 'NAV'
+            chart_values = nav_values
 
-        clean_filtered_data = clean_chart_data(filtered_data, chart_column)
+        # The chart only needs dates and the already-numeric values, not the whole slice
+        chart_data = pd.DataFrame({'Date': filtered_data['Date'].to_numpy(), chart_column: chart_values})
+        clean_filtered_data = clean_chart_data(chart_data, chart_column)
+        y_max = clean_filtered_data[chart_column].max()
 
+        # Long ranges are downsampled before they are serialized to the browser; narrow (zoomed-in)
+        # ranges fit the budget and are drawn at full resolution
+        max_points = chart_point_budget()
+        if max_points is not None:
+            with stage("downsample_chart", rows=len(clean_filtered_data)) as timing:
+                clean_filtered_data = downsample_chart_data(clean_filtered_data, 'Date', chart_column, max_points)
+                timing.count(points=len(clean_filtered_data))
 
         line_chart = alt.Chart(clean_filtered_data).mark_line().encode(
             x='Date:T',
-            y=alt.Y(f'{chart_column}:Q', scale=alt.Scale(domain=[80, clean_filtered_data[chart_column].max()])),
+            y=alt.Y(f'{chart_column}:Q', scale=alt.Scale(domain=[80, y_max])),
             tooltip=['Date:T', f'{chart_column}:Q']
         ).properties(
             width=700,
             height=400
         )
         st.write(f"### Displaying data from {selected_workbook}")
-        st.altair_chart(line_chart, use_container_width=True)
+        with stage("render_chart", points=len(clean_filtered_data)):
+            st.altair_chart(line_chart, use_container_width=True)
 
-        updated_filtered_data, repeated_dates, first_instances, second_instances = handle_repeated_dates(filtered_data)
+        with st.expander("Performance metrics"):
+            with stage("performance_metrics"):
+                performance_panel(cached_performance(file_path, version, nav_data, nav_index))
 
+        table = memo.get(file_path, version, 'table', selected_range, start_date, end_date)
+        if table is None:
+            with stage("handle_repeated_dates", rows=len(filtered_data)):
+                updated_filtered_data, repeated_dates, first_instances, second_instances = handle_repeated_dates(filtered_data)
 
-        # Insert stock names above the relevant block data
-        final_data = insert_stock_names_above_data(stock_blocks,updated_filtered_data, repeated_dates, first_instances, second_instances)
-        formatted_data = format_table_data(final_data)
 
-        # Highlight rows that contain string values in 'Stock1' to 'Stock5'
-        highlighted_table = highlight_rows_with_strings(formatted_data)
+            # Insert stock names above the relevant block data
+            with stage("insert_stock_names") as timing:
+                final_data = insert_stock_names_above_data(stock_blocks,updated_filtered_data, repeated_dates, first_instances, second_instances)
+                table = (final_data, stock_name_row_mask(final_data))
+                timing.count(rows=len(final_data))
+            memo.put(file_path, version, 'table', selected_range, start_date, end_date, value=table)
+        final_data, mask = table
 
-        # Display the combined filtered data with highlighted stock names
+        # Display the combined filtered data with stock name rows highlighted, a page at a time
         st.write("### Stock Data Table")
-        st.dataframe(highlighted_table)
+        show_table_page(final_data, mask)
+        show_memo_stats(memo)
 
 
     else:
         st.error("Failed to load data. Please check the workbook format.")
 
 if __name__ == "__main__":
-    main()
+    run_with_timings(main)
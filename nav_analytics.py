@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+
+# Calendar lookback of each trailing return
+TRAILING_HORIZONS = {"1 Month": 30, "3 Months": 91, "6 Months": 182, "1 Year": 365, "3 Years": 1095}
+
+# Trading days in the rolling window (about three months)
+ROLLING_WINDOW = 63
+
+
+# Function to turn a NAV path into period returns
+def nav_returns(nav):
+    nav = np.asarray(nav, dtype=float)
+    return nav[1:] / nav[:-1] - 1
+
+
+# Function to compute the return over each trailing horizon, measured from the last date back;
+# NaN where the history is shorter than the horizon
+def trailing_returns(dates, nav, horizons=TRAILING_HORIZONS):
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    nav = np.asarray(nav, dtype=float)
+    results = {}
+    for name, days in horizons.items():
+        cutoff = dates[-1] - np.timedelta64(days, 'D')
+        # The last NAV on or before the cutoff is the starting point
+        start = np.searchsorted(dates, cutoff, side='right') - 1
+        results[name] = nav[-1] / nav[start] - 1 if start >= 0 else np.nan
+    return results
+
+
+# Function to compute the compound annual growth rate over the whole series
+def cagr(dates, nav):
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    years = (dates[-1] - dates[0]) / np.timedelta64(365, 'D')
+    if years <= 0:
+        return np.nan
+    return (nav[-1] / nav[0]) ** (1 / years) - 1
+
+
+def annualized_volatility(returns, periods_per_year=TRADING_DAYS_PER_YEAR):
+    returns = np.asarray(returns, dtype=float)
+    if len(returns) < 2:
+        return np.nan
+    return returns.std(ddof=1) * np.sqrt(periods_per_year)
+
+
+def sharpe_ratio(returns, risk_free_rate=0.0, periods_per_year=TRADING_DAYS_PER_YEAR):
+    returns = np.asarray(returns, dtype=float)
+    volatility = annualized_volatility(returns, periods_per_year)
+    if not volatility:
+        return np.nan
+    excess = returns.mean() * periods_per_year - risk_free_rate
+    return excess / volatility
+
+
+# Function to compute the drawdown from the running peak at every point
+def drawdowns(nav):
+    nav = np.asarray(nav, dtype=float)
+    return nav / np.maximum.accumulate(nav) - 1
+
+
+# Function to find the deepest drawdown and the peak/trough dates it ran between
+def max_drawdown(dates, nav):
+    depth = drawdowns(nav)
+    trough = int(np.argmin(depth))
+    peak = int(np.argmax(nav[:trough + 1]))
+    return {'max_drawdown': depth[trough], 'peak_date': pd.Timestamp(dates[peak]), 'trough_date': pd.Timestamp(dates[trough])}
+
+
+# Function to compute rolling return, annualized volatility and Sharpe ratio plus the drawdown path
+def rolling_metrics(dates, nav, window=ROLLING_WINDOW, risk_free_rate=0.0, periods_per_year=TRADING_DAYS_PER_YEAR):
+    nav = pd.Series(np.asarray(nav, dtype=float), index=pd.DatetimeIndex(dates))
+    returns = nav.pct_change()
+    rolling = returns.rolling(window, min_periods=window)
+
+    volatility = rolling.std() * np.sqrt(periods_per_year)
+    sharpe = (rolling.mean() * periods_per_year - risk_free_rate) / volatility
+    return pd.DataFrame({
+        'Date': nav.index,
+        'Rolling Return': (nav / nav.shift(window) - 1).to_numpy(),
+        'Rolling Volatility': volatility.to_numpy(),
+        'Rolling Sharpe': sharpe.to_numpy(),
+        'Drawdown': drawdowns(nav.to_numpy()),
+    })
+
+
+# Function to summarize a NAV series: trailing returns, CAGR, volatility, Sharpe ratio and max drawdown
+def performance_summary(dates, nav, risk_free_rate=0.0):
+    returns = nav_returns(nav)
+    return {
+        'trailing_returns': trailing_returns(dates, nav),
+        'cagr': cagr(dates, nav),
+        'volatility': annualized_volatility(returns),
+        'sharpe': sharpe_ratio(returns, risk_free_rate),
+        **max_drawdown(dates, nav),
+    }
+
+
+# Function to attribute each rebalance block's return to its stocks.
+# `block_index` is segment_stock_blocks' output; a stock's contribution is its price change times its
+# quantity over the block's opening basket value, so contributions add up to the block's NAV return
+# wherever the sheet's NAV follows its own prices and quantities. `prices` (rows x Stock1..Stock5, which
+# also holds the quantities) and `nav` are the frame's value columns as float arrays, row for row.
+def block_attribution(data, block_index, prices, nav):
+    stock_columns = ['Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5']
+    dates = data['Date'].to_numpy()
+
+    has_rows = block_index['date_end'] > block_index['date_start']
+    blocks = np.flatnonzero(has_rows)
+    first_rows = block_index['date_rows'][block_index['date_start'][blocks]]
+    last_rows = block_index['date_rows'][block_index['date_end'][blocks] - 1]
+
+    # The 'Quantities' row sits right above a block's first data row
+    quantity_rows = block_index['start_idx'][blocks] - 1
+    quantities = prices[quantity_rows].copy()
+    quantities[data['Header'].to_numpy()[quantity_rows] != 'Quantities'] = np.nan
+
+    opening_basket = np.nansum(prices[first_rows] * quantities, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contributions = (prices[last_rows] - prices[first_rows]) * quantities / opening_basket[:, None]
+        block_returns = nav[last_rows] / nav[first_rows] - 1
+
+    names = block_index['stock_names'][blocks]
+    summary = pd.DataFrame({
+        'Block': blocks + 1,
+        'Start': dates[first_rows],
+        'End': dates[last_rows],
+        'Block Return': block_returns,
+    })
+    detail = pd.DataFrame({
+        'Block': np.repeat(blocks + 1, len(stock_columns)),
+        'Stock': names.reshape(-1),
+        'Quantity': quantities.reshape(-1),
+        'Start Price': prices[first_rows].reshape(-1),
+        'End Price': prices[last_rows].reshape(-1),
+        'Contribution': contributions.reshape(-1),
+    }).dropna(subset=['Stock'])
+    return summary, detail
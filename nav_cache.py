@@ -0,0 +1,322 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from array import array
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from nav_timing import stage
+
+# Directory holding the columnar copies of the NAV workbooks (safe to delete at any time)
+CACHE_DIR = ".nav_cache"
+
+# Bump this whenever the on-disk layout of the cached tables, or what a cached object holds, changes
+CACHE_FORMAT_VERSION = 5
+
+NAV_COLUMNS = ['Date', 'Header', 'Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5', 'Basket Value', 'Returns', 'NAV']
+VALUE_COLUMNS = NAV_COLUMNS[2:]
+
+# datetime64[ns] NaT as the int64 it is stored as
+NAT = np.iinfo(np.int64).min
+
+
+# Function to read a value cell as a number, the way pd.to_numeric does; None means the cell is a label
+def _cell_number(value):
+    if value is None:
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+# Function to read a Date cell; text dates are parsed here so the column never needs coercing later
+def _cell_date(value):
+    if value is None:
+        return NAT
+    if isinstance(value, datetime):
+        return int(np.datetime64(value, 'ns').astype(np.int64))
+    if isinstance(value, str):
+        try:
+            # ISO dates, which is how the workbooks store them, parse without going through pandas
+            return int(np.datetime64(value.strip(), 'ns').astype(np.int64))
+        except ValueError:
+            pass
+    timestamp = pd.to_datetime(value, errors='coerce')
+    return NAT if pd.isna(timestamp) else timestamp.value
+
+
+# Function to stream the first sheet of a workbook straight into the typed price table and the
+# stock-name table the cache stores. The sheet is read row by row in read-only mode and split as it
+# goes, so no object frame of the whole sheet is ever built.
+def stream_nav_tables(file_path):
+    value_rows, value_dates, value_headers = array('q'), array('q'), []
+    values = {col: array('d') for col in VALUE_COLUMNS}
+    label_rows, label_dates, label_headers = array('q'), array('q'), []
+    labels = {col: [] for col in VALUE_COLUMNS}
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        row_id = 0
+        blank_rows = 0
+        for cells in sheet.iter_rows(max_col=len(NAV_COLUMNS), values_only=True):
+            if all(cell is None for cell in cells):
+                # Blank rows count only when something follows them, as with pd.read_excel
+                blank_rows += 1
+                continue
+            for _ in range(blank_rows):
+                value_rows.append(row_id)
+                value_dates.append(NAT)
+                value_headers.append(None)
+                for col in VALUE_COLUMNS:
+                    values[col].append(np.nan)
+                row_id += 1
+            blank_rows = 0
+
+            cells = (*cells, *(None,) * (len(NAV_COLUMNS) - len(cells)))
+            header = None if cells[1] is None else str(cells[1])
+            numbers = [_cell_number(cell) for cell in cells[2:]]
+            if None in numbers:
+                # A cell that holds something but does not parse as a number is a label (e.g. a ticker name)
+                label_rows.append(row_id)
+                label_dates.append(_cell_date(cells[0]))
+                label_headers.append(header)
+                for col, cell in zip(VALUE_COLUMNS, cells[2:]):
+                    labels[col].append(None if cell is None else str(cell))
+            else:
+                value_rows.append(row_id)
+                value_dates.append(_cell_date(cells[0]))
+                value_headers.append(header)
+                for col, number in zip(VALUE_COLUMNS, numbers):
+                    values[col].append(number)
+            row_id += 1
+    finally:
+        workbook.close()
+
+    values_table = pa.table({
+        'row': pa.array(np.frombuffer(value_rows, dtype=np.int64)),
+        'Date': pa.array(np.frombuffer(value_dates, dtype='datetime64[ns]'), type=pa.timestamp('ns')),
+        'Header': pa.array(value_headers, type=pa.string()),
+        **{col: pa.array(np.frombuffer(values[col], dtype=np.float64)) for col in VALUE_COLUMNS},
+    })
+    # Stock names repeat from block to block, so they are stored dictionary-encoded (categorical)
+    labels_table = pa.table({
+        'row': pa.array(np.frombuffer(label_rows, dtype=np.int64)),
+        'Date': pa.array(np.frombuffer(label_dates, dtype='datetime64[ns]'), type=pa.timestamp('ns')),
+        'Header': pa.array(label_headers, type=pa.string()).dictionary_encode(),
+        **{col: pa.array(labels[col], type=pa.string()).dictionary_encode() for col in VALUE_COLUMNS},
+    })
+    return values_table, labels_table
+
+
+# Function to build the cache file prefix for a workbook (one set of files per workbook path)
+def _cache_prefix(file_path, cache_dir):
+    key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{key}")
+
+
+# Function to hash the workbook contents, used when the mtime changed but the file may not have
+def _file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function to rebuild the frame load_nav_data has always returned from the two cached tables
+def join_nav_tables(values_table, labels_table):
+    n_rows = values_table.num_rows + labels_table.num_rows
+    value_rows = values_table.column('row').to_numpy()
+    label_rows = labels_table.column('row').to_numpy()
+
+    dates = np.full(n_rows, np.datetime64('NaT'), dtype='datetime64[ns]')
+    dates[value_rows] = values_table.column('Date').to_numpy()
+    dates[label_rows] = labels_table.column('Date').to_numpy()
+
+    columns = {}
+    for col in NAV_COLUMNS[1:]:
+        labels = labels_table.column(col)
+        if col != 'Header' and labels.null_count == labels_table.num_rows:
+            # Purely numeric columns come back as float64, the same dtype pd.read_excel infers
+            numbers = np.full(n_rows, np.nan)
+            numbers[value_rows] = values_table.column(col).to_numpy()
+            columns[col] = numbers
+            continue
+
+        cells = np.full(n_rows, np.nan, dtype=object)
+        if col == 'Header':
+            sources = ((values_table.column(col), value_rows), (labels, label_rows))
+        else:
+            cells[value_rows] = values_table.column(col).to_numpy().astype(object)
+            sources = ((labels, label_rows),)
+        for column, rows in sources:
+            present = column.is_valid().to_numpy(zero_copy_only=False)
+            cells[rows[present]] = np.asarray(column.drop_null().to_pylist(), dtype=object)
+        columns[col] = cells
+
+    return pd.DataFrame({'Date': dates, **columns}, columns=NAV_COLUMNS)
+
+
+# Function to write a cache file through a temp file of its own, so concurrent writers (pool workers and
+# session threads rebuilding the same workbook) never share one, and to swap it into place whole
+def _write_atomically(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_table(table, path):
+    def write(tmp_path):
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            # Uncompressed Arrow IPC so the file can be memory-mapped back without decoding
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    _write_atomically(path, write)
+
+
+def _read_table(path):
+    with pa.memory_map(path, 'r') as source:
+        return ipc.open_file(source).read_all()
+
+
+# Function to return a workbook's typed (values, labels) tables, parsing the Excel file only when it has changed
+def load_cached_tables(file_path, parse=stream_nav_tables, cache_dir=CACHE_DIR):
+    prefix = _cache_prefix(file_path, cache_dir)
+    meta_path = f"{prefix}.json"
+    values_path = f"{prefix}.values.arrow"
+    labels_path = f"{prefix}.labels.arrow"
+
+    stat = os.stat(file_path)
+    meta = _read_meta(meta_path)
+    fresh = (
+        meta is not None
+        and meta.get('format') == CACHE_FORMAT_VERSION
+        and os.path.exists(values_path)
+        and os.path.exists(labels_path)
+    )
+    digest = None
+    if fresh and (meta.get('mtime_ns') != stat.st_mtime_ns or meta.get('size') != stat.st_size):
+        # A checkout or copy can touch the mtime without changing the contents
+        digest = _file_digest(file_path)
+        fresh = meta.get('sha256') == digest
+
+    if fresh:
+        try:
+            with stage("cache_read", workbook=os.path.basename(file_path)) as timing:
+                tables = _read_table(values_path), _read_table(labels_path)
+                timing.count(rows=tables[0].num_rows + tables[1].num_rows)
+            if meta.get('mtime_ns') != stat.st_mtime_ns:
+                meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                _write_meta(meta_path, meta)
+            return tables
+        except (OSError, pa.ArrowInvalid):
+            pass  # Corrupt or truncated cache files are simply rebuilt below
+
+    with stage("parse_workbook", workbook=os.path.basename(file_path)) as timing:
+        values_table, labels_table = parse(file_path)
+        timing.count(rows=values_table.num_rows + labels_table.num_rows)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with stage("cache_write", workbook=os.path.basename(file_path)) as timing:
+            _write_table(values_table, values_path)
+            _write_table(labels_table, labels_path)
+            timing.count(bytes=os.path.getsize(values_path) + os.path.getsize(labels_path))
+        _write_meta(meta_path, {
+            'format': CACHE_FORMAT_VERSION,
+            'source': os.path.abspath(file_path),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': digest or _file_digest(file_path),
+        })
+    except OSError as e:
+        # A read-only checkout still works, it just parses the workbook every time
+        print(f"Could not write NAV cache for {file_path}: {e}")
+    return values_table, labels_table
+
+
+# Function to return a workbook's NAV frame, parsing the Excel file only when it has changed
+def load_cached_workbook(file_path, parse=stream_nav_tables, cache_dir=CACHE_DIR):
+    return join_nav_tables(*load_cached_tables(file_path, parse, cache_dir))
+
+
+# Function to tell whether a workbook's cached tables are current, without hashing or reading them
+def is_cached(file_path, cache_dir=CACHE_DIR):
+    prefix = _cache_prefix(file_path, cache_dir)
+    meta = _read_meta(f"{prefix}.json")
+    stat = os.stat(file_path)
+    return (
+        meta is not None
+        and meta.get('format') == CACHE_FORMAT_VERSION
+        and meta.get('mtime_ns') == stat.st_mtime_ns
+        and meta.get('size') == stat.st_size
+        and os.path.exists(f"{prefix}.values.arrow")
+        and os.path.exists(f"{prefix}.labels.arrow")
+    )
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+
+    _write_atomically(meta_path, write)
+
+
+# Function to return a value derived from a file (e.g. a sheet summary), rebuilding it only when
+# the file's mtime or size changed. `name` distinguishes several derived values of one file.
+def load_cached_object(file_path, name, build, cache_dir=CACHE_DIR):
+    path = f"{_cache_prefix(file_path, cache_dir)}.{name}.pickle"
+    stat = os.stat(file_path)
+    version = (CACHE_FORMAT_VERSION, stat.st_mtime_ns, stat.st_size)
+
+    try:
+        with open(path, 'rb') as f:
+            cached_version, value = pickle.load(f)
+        if cached_version == version:
+            return value
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+
+    value = build(file_path)
+
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((version, value), f)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomically(path, write)
+    except OSError as e:
+        print(f"Could not write {name} cache for {file_path}: {e}")
+    return value
@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from nav_cache import is_cached, load_cached_tables
+from nav_ledger import read_ledger_frame
+
+
+# Function to load one workbook's NAV history as two compact arrays (dates, NAV), pending rows included.
+# Runs in worker processes, so it only returns arrays rather than the whole frame.
+def load_nav_series(file_path):
+    # Only the typed price table is needed: stock-name rows never carry a NAV
+    values_table, _ = load_cached_tables(file_path)
+    pending = read_ledger_frame(file_path)
+
+    dates = np.concatenate([values_table.column('Date').to_numpy(), pending['Date'].to_numpy(dtype='datetime64[ns]')])
+    nav = np.concatenate([values_table.column('NAV').to_numpy(), pending['NAV'].to_numpy(dtype=float)])
+
+    # Header rows have no date or NAV; a rebalance date appears twice with the same NAV, keep the first.
+    # np.unique also sorts by date, which rebased_comparison's searchsorted relies on
+    keep = ~np.isnat(dates) & ~np.isnan(nav)
+    dates, first = np.unique(dates[keep], return_index=True)
+    return dates, nav[keep][first]
+
+
+# Function to create the process pool that parses workbooks. Excel parsing is CPU-bound, so threads
+# would serialize on the GIL. "spawn" keeps workers independent of the server's threads.
+def create_loader_pool(max_workers=None):
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+# Function to load several workbooks at once. Workbooks whose columnar cache is current load in-process
+# in milliseconds; the rest are parsed in parallel on `executor`, so the wait is the slowest single parse.
+def load_nav_series_parallel(file_paths, executor=None):
+    stale = [file_path for file_path in file_paths if not is_cached(file_path)]
+    futures = {}
+    if executor is not None and len(stale) > 1:
+        futures = {file_path: executor.submit(load_nav_series, file_path) for file_path in stale}
+
+    series = {}
+    for file_path in file_paths:
+        if file_path not in futures:
+            series[file_path] = load_nav_series(file_path)
+    for file_path, future in futures.items():
+        series[file_path] = future.result()
+    return series
+
+
+# Function to rebase each series to 100 at its first date inside [start, end]; returns a long-form frame
+def rebased_comparison(series, start=None, end=None):
+    frames = []
+    for name, (dates, nav) in series.items():
+        lo = np.searchsorted(dates, np.datetime64(start), side='left') if start is not None else 0
+        hi = np.searchsorted(dates, np.datetime64(end), side='right') if end is not None else len(dates)
+        if hi <= lo:
+            continue
+        window = nav[lo:hi]
+        frames.append(pd.DataFrame({'Date': dates[lo:hi], 'Workbook': name, 'Rebased NAV': window / window[0] * 100}))
+
+    if not frames:
+        return pd.DataFrame(columns=['Date', 'Workbook', 'Rebased NAV'])
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+# Most points a chart line is drawn with; longer series are downsampled to this many
+CHART_POINT_BUDGET = 1500
+
+
+# Function to pick `max_points` row positions of a series with Largest-Triangle-Three-Buckets.
+# The first and last points are always kept; every bucket in between keeps the point forming the
+# largest triangle with the point kept before it and the next bucket's average, which holds on to
+# peaks and troughs (and so drawdowns) that plain striding would skip.
+def lttb_indices(x, y, max_points):
+    n_points = len(x)
+    if max_points >= n_points or max_points < 3:
+        return np.arange(n_points)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Interior points split into max_points - 2 buckets of (almost) equal size; bucket averages via cumsums
+    edges = np.linspace(1, n_points - 1, max_points - 1).astype(np.int64)
+    counts = edges[1:] - edges[:-1]
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y)))
+    next_x = np.append(((x_sums[edges[1:]] - x_sums[edges[:-1]]) / counts)[1:], x[-1])
+    next_y = np.append(((y_sums[edges[1:]] - y_sums[edges[:-1]]) / counts)[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n_points - 1
+    previous = 0
+    # Each bucket depends on the point kept in the one before, so buckets go in order; the work inside is vectorized
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - next_x[bucket]) * (y[lo:hi] - py) - (px - x[lo:hi]) * (next_y[bucket] - py))
+        previous = lo + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+# Function to downsample a chart frame to at most `max_points` rows per line (per `by` group if given).
+# Frames already within budget are returned unchanged, so short or zoomed-in ranges keep full resolution.
+def downsample_chart_data(data, x_column, y_column, max_points=CHART_POINT_BUDGET, by=None):
+    if by is None:
+        if len(data) <= max_points:
+            return data
+        x = data[x_column].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        return data.iloc[lttb_indices(x, data[y_column].to_numpy(dtype=float), max_points)]
+
+    groups = [downsample_chart_data(group, x_column, y_column, max_points) for _, group in data.groupby(by, sort=False)]
+    return pd.concat(groups, ignore_index=True) if groups else data
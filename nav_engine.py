@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# How a date with a missing close for some stock is handled:
+#   "ffill" - carry the stock's previous close forward (from the sheet's last row for the first new date),
+#             but only across gaps the stock has a real close after; later dates wait for that close
+#   "skip"  - leave the date out entirely
+MISSING_PRICE_POLICIES = ("ffill", "skip")
+DEFAULT_MISSING_PRICE_POLICY = "ffill"
+
+
+# Function to line up closing-price series into a (dates x tickers) matrix, NaN where a close is missing
+def align_closes(closes, symbols, dates):
+    dates = pd.DatetimeIndex(dates)
+    matrix = np.full((len(dates), len(symbols)), np.nan)
+    for j, symbol in enumerate(symbols):
+        series = closes.get(symbol)
+        if series is not None and not series.empty:
+            matrix[:, j] = series.reindex(dates).to_numpy(dtype=float)
+    return matrix
+
+
+# Function to forward-fill each column of a price matrix, seeding the first row from `last_prices`
+def forward_fill_prices(prices, last_prices=None):
+    filled = np.array(prices, dtype=float, copy=True)
+    if last_prices is not None and len(filled):
+        seed = np.asarray(last_prices, dtype=float)
+        filled[0] = np.where(np.isnan(filled[0]), seed, filled[0])
+
+    # Index of the last row with a value, per column, carried down; then gather
+    rows = np.where(np.isnan(filled), 0, np.arange(len(filled))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return filled[rows, np.arange(filled.shape[1])]
+
+
+# Function to compute basket values, returns and the chained NAV for a block of dates in one pass.
+# Returns a dict of arrays: 'keep' (mask of input dates that produced a row), 'prices', 'basket', 'returns', 'nav'.
+def compute_nav(prices, quantities, last_basket_value, last_nav, missing=DEFAULT_MISSING_PRICE_POLICY, last_prices=None):
+    if missing not in MISSING_PRICE_POLICIES:
+        raise ValueError(f"Unknown missing-price policy {missing!r}; expected one of {MISSING_PRICE_POLICIES}")
+
+    quantities = np.asarray(quantities, dtype=float)
+    # A blank quantity would turn every basket, return and NAV into NaN and chain it into later runs
+    if not np.isfinite(quantities).all():
+        raise ValueError(f"Quantities must be finite numbers, got {quantities.tolist()}")
+    prices = np.asarray(prices, dtype=float).reshape(-1, len(quantities))
+
+    if missing == "ffill":
+        # After a stock's last real close in the window (or for a stock that returned none, e.g. an empty
+        # response or a failed fetch) the close may just not be available yet; filling it would write a
+        # stale price that a later run never revisits, so only gaps followed by a real close are filled
+        closed_later = np.logical_or.accumulate(~np.isnan(prices)[::-1], axis=0)[::-1]
+        prices = np.where(closed_later, forward_fill_prices(prices, last_prices), np.nan)
+    # Whatever is still missing (no earlier close to carry, or the "skip" policy) drops the date
+    keep = ~np.isnan(prices).any(axis=1)
+    prices = prices[keep]
+
+    basket = prices @ quantities
+    previous = np.concatenate(([last_basket_value], basket[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(previous != 0, (basket - previous) / previous, 0.0)
+    nav = last_nav * np.cumprod(1 + returns)
+
+    return {'keep': keep, 'prices': prices, 'basket': basket, 'returns': returns, 'nav': nav}
@@ -0,0 +1,112 @@
+import csv
+import os
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from nav_cache import NAV_COLUMNS
+from nav_timing import stage
+
+# New rows are appended to a per-workbook CSV ledger next to the workbooks instead of rewriting the
+# xlsx; `nav_updater.py --export` folds them into the workbooks on demand
+LEDGER_DIRNAME = "ledger"
+LEDGER_COLUMNS = ['Sheet', 'Date', 'Stock1', 'Stock2', 'Stock3', 'Stock4', 'Stock5', 'Basket Value', 'Returns', 'NAV']
+
+
+# Function to return the ledger file of a workbook, e.g. NAV/ledger/IT_Stocks.csv
+def ledger_path(file_path):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(os.path.dirname(file_path), LEDGER_DIRNAME, f"{stem}.csv")
+
+
+def _format_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    return repr(float(value))
+
+
+def _parse_cell(value):
+    return float(value) if value != "" else None
+
+
+# Function to append rows ([date, None, prices..., basket, return, nav], as written to the sheet) for one sheet.
+# Cost is proportional to the rows appended, not to the size of the workbook.
+def append_rows(file_path, sheet_name, rows):
+    if not rows:
+        return
+    path = ledger_path(file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+
+    with stage("append_ledger", sheet=sheet_name, rows=len(rows)) as timing, open(path, 'a', newline='') as f:
+        start = f.tell()
+        writer = csv.writer(f)
+        if is_new:
+            writer.writerow(LEDGER_COLUMNS)
+        for row in rows:
+            # Column B (the 'Header' column) is always empty on price rows, so it is not stored
+            writer.writerow([sheet_name, _format_cell(row[0]), *(_format_cell(value) for value in row[2:])])
+        timing.count(bytes=f.tell() - start)
+
+
+# Function to read the pending rows of a workbook, grouped by sheet, in the same layout append_rows takes
+def read_ledger(file_path):
+    path = ledger_path(file_path)
+    if not os.path.exists(path):
+        return {}
+
+    pending = {}
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Header row
+        for record in reader:
+            if not record:
+                continue
+            sheet_name, date_text, *values = record
+            row = [datetime.strptime(date_text, '%Y-%m-%d'), None, *(_parse_cell(value) for value in values)]
+            pending.setdefault(sheet_name, []).append(row)
+    return pending
+
+
+# Function to empty a workbook's ledger once its rows are in the xlsx (the header stays so git keeps the file)
+def clear_ledger(file_path):
+    path = ledger_path(file_path)
+    if os.path.exists(path):
+        with open(path, 'w', newline='') as f:
+            csv.writer(f).writerow(LEDGER_COLUMNS)
+
+
+# Function to return a key that changes whenever the workbook or its pending rows change
+def workbook_version(file_path):
+    versions = []
+    for path in (file_path, ledger_path(file_path)):
+        try:
+            stat = os.stat(path)
+            versions.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            versions.append(None)
+    return tuple(versions)
+
+
+# Function to return the pending rows of the workbook's first sheet in the load_nav_data layout
+def read_ledger_frame(file_path):
+    pending = read_ledger(file_path)
+    if not pending:
+        return pd.DataFrame(columns=NAV_COLUMNS)
+
+    # The dashboard shows the first sheet; only look its name up when there is something pending
+    workbook = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        first_sheet = workbook.sheetnames[0]
+    finally:
+        workbook.close()
+
+    rows = pending.get(first_sheet, [])
+    data = pd.DataFrame(rows, columns=NAV_COLUMNS)
+    data['Date'] = pd.to_datetime(data['Date'])
+    data['Header'] = data['Header'].astype(object).where(data['Header'].notna(), np.nan)
+    return data
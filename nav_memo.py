@@ -0,0 +1,116 @@
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+
+# Memory the memoized pipeline results may take before the least recently used are evicted
+MEMO_BUDGET_BYTES = 256 * 1024 * 1024
+
+
+# Values of object columns sampled to estimate their size; measuring every value costs as much as a miss
+SIZE_SAMPLE_ROWS = 1000
+
+
+# Function to estimate how much memory a cached value holds
+def estimate_size(value):
+    if isinstance(value, pd.DataFrame):
+        size = int(value.memory_usage(index=True, deep=False).sum())
+        if len(value) > SIZE_SAMPLE_ROWS:
+            sample = value.iloc[np.linspace(0, len(value) - 1, SIZE_SAMPLE_ROWS).astype(np.int64)]
+            scale = len(value) / SIZE_SAMPLE_ROWS
+        else:
+            sample, scale = value, 1
+        for column in value.columns[(value.dtypes == object).to_numpy()]:
+            # deep=True adds each object's own size on top of the pointers already counted
+            size += int((sample[column].memory_usage(index=False, deep=True) - sample[column].memory_usage(index=False)) * scale)
+        return size
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class _CountingLRUCache(LRUCache):
+    def __init__(self, maxsize, getsizeof=None):
+        super().__init__(maxsize, getsizeof)
+        self.evictions = 0
+
+    def popitem(self):
+        self.evictions += 1
+        return super().popitem()
+
+
+# LRU memo of the dashboard pipeline's intermediate results, bounded by an estimated memory budget.
+# Keys are (file path, workbook version, *params). A workbook's version changes whenever the updater
+# appends to its ledger or the workbook is rewritten, so the first lookup of a new version evicts every
+# entry of the older one. Safe to share between the server's session threads.
+class PipelineMemo:
+    def __init__(self, max_bytes=MEMO_BUDGET_BYTES):
+        self._cache = _CountingLRUCache(maxsize=max_bytes, getsizeof=estimate_size)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Function to drop the entries of older versions of a workbook (call with the lock held)
+    def _track_version(self, file_path, version):
+        if self._versions.get(file_path, version) != version:
+            self._invalidate(file_path)
+        self._versions[file_path] = version
+
+    def _invalidate(self, file_path):
+        for key in [key for key in self._cache if key[0] == file_path]:
+            del self._cache[key]
+        self._versions.pop(file_path, None)
+
+    # Function to return a memoized result, or None on a miss
+    def get(self, file_path, version, *params):
+        with self._lock:
+            self._track_version(file_path, version)
+            value = self._cache.get((file_path, version, *params))
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    # Function to memoize a result; values larger than the whole budget are not kept
+    def put(self, file_path, version, *params, value):
+        with self._lock:
+            self._track_version(file_path, version)
+            try:
+                self._cache[(file_path, version, *params)] = value
+            except ValueError:
+                pass
+
+    # Function to drop everything memoized for one workbook, or for all of them
+    def invalidate(self, file_path=None):
+        with self._lock:
+            if file_path is None:
+                # Deleted key by key: clear() would go through popitem and count as evictions
+                for key in list(self._cache):
+                    del self._cache[key]
+                self._versions.clear()
+            else:
+                self._invalidate(file_path)
+
+    # Function to report hit/miss counters and memory use, for sizing the budget
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self._cache.evictions,
+                'entries': len(self._cache),
+                'bytes': self._cache.currsize,
+                'max_bytes': self._cache.maxsize,
+            }
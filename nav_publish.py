@@ -0,0 +1,176 @@
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from tenacity import Retrying, stop_after_attempt, wait_exponential
+
+from nav_timing import stage
+
+# Pause after the first queued update so updates arriving together go into one commit
+COALESCE_SECONDS = 2.0
+PUSH_ATTEMPTS = 5
+PUSH_BACKOFF_MAX_SECONDS = 60
+
+
+class GitCommandError(Exception):
+    pass
+
+
+# Publishes updated files to a git remote from a background thread. publish() only queues the files
+# and returns; the worker stages everything queued in one `git add`, makes one commit for all of it and
+# pushes with retries and exponential backoff. Commits whose push failed are pushed with the next batch.
+class GitPublisher:
+    def __init__(self, repo_dir=".", remote=None, branch=None, coalesce_seconds=COALESCE_SECONDS,
+                 push_attempts=PUSH_ATTEMPTS, backoff_max=PUSH_BACKOFF_MAX_SECONDS):
+        self.repo_dir = repo_dir
+        self.remote = remote
+        self.branch = branch
+        self.coalesce_seconds = coalesce_seconds
+        self.push_attempts = push_attempts
+        self.backoff_max = backoff_max
+
+        self._condition = threading.Condition()
+        self._pending_paths = []
+        self._pending_messages = []
+        self._unpushed = False
+        self._busy = False
+        self._closed = False
+        self._thread = None
+        self._status = {
+            'state': 'idle',
+            'last_commit': None,
+            'last_pushed_at': None,
+            'last_error': None,
+            'push_attempts': 0,
+        }
+
+    # Function to queue files for publishing; never waits for git
+    def publish(self, paths, message):
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Publisher is closed")
+            self._pending_paths.extend(path for path in paths if path not in self._pending_paths)
+            self._pending_messages.append(message)
+            if self._status['state'] in ('idle', 'failed'):
+                self._status['state'] = 'queued'
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="git-publisher", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    # Function to return a snapshot of what the publisher is doing and how the last push went
+    def status(self):
+        with self._condition:
+            return {
+                **self._status,
+                'queued_updates': len(self._pending_messages),
+                'queued_files': list(self._pending_paths),
+                'unpushed_commits': self._unpushed,
+            }
+
+    # Function to wait until everything queued so far is pushed (or has failed); returns True on success
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending_messages or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return not self._unpushed and self._status['state'] != 'failed'
+
+    # Function to stop the worker once the queue is drained
+    def close(self, timeout=None):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _git(self, *args):
+        result = subprocess.run(["git", *args], cwd=self.repo_dir, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise GitCommandError(f"git {' '.join(args)} failed: {result.stderr.strip() or result.stdout.strip()}")
+        return result.stdout
+
+    def _set_status(self, **changes):
+        with self._condition:
+            self._status.update(changes)
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending_messages and not self._closed:
+                    self._condition.wait()
+                if not self._pending_messages and self._closed:
+                    return
+                self._busy = True
+
+            # Let updates that arrive right behind this one join the same commit
+            if self.coalesce_seconds and not self._closed:
+                time.sleep(self.coalesce_seconds)
+
+            with self._condition:
+                paths, self._pending_paths = self._pending_paths, []
+                messages, self._pending_messages = self._pending_messages, []
+
+            try:
+                self._commit(paths, messages)
+                if self._unpushed:
+                    self._push()
+            except Exception as e:
+                print(f"Error during git operation: {e}")
+                self._set_status(state='failed', last_error=str(e))
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    # Function to stage every queued file in one call and commit them together
+    def _commit(self, paths, messages):
+        self._set_status(state='committing')
+        with stage("git_add", files=len(paths)):
+            self._git("add", "--", *paths)
+
+        # Nothing staged (the files did not change): there is nothing to commit
+        if not self._git("diff", "--cached", "--name-only"):
+            print("No changes to commit.")
+            self._set_status(state='idle')
+            return
+
+        if len(messages) == 1:
+            commit_message = messages[0]
+        else:
+            commit_message = f"Updated {len(paths)} files with new data\n\n" + "\n".join(f"- {message}" for message in messages)
+        with stage("git_commit", files=len(paths), updates=len(messages)):
+            self._git("commit", "-m", commit_message)
+        commit = self._git("rev-parse", "--short", "HEAD").strip()
+        with self._condition:
+            self._unpushed = True
+        self._set_status(last_commit=commit)
+
+    def _push(self):
+        self._set_status(state='pushing', push_attempts=0)
+        push_args = ["push"]
+        if self.remote:
+            push_args.append(self.remote)
+            if self.branch:
+                push_args.append(f"HEAD:{self.branch}")
+
+        with stage("git_push") as timing:
+            retrying = Retrying(
+                stop=stop_after_attempt(self.push_attempts),
+                wait=wait_exponential(multiplier=1, max=self.backoff_max),
+                reraise=True,
+            )
+            for attempt in retrying:
+                with attempt:
+                    self._set_status(push_attempts=attempt.retry_state.attempt_number)
+                    self._git(*push_args)
+            timing.count(attempts=self._status['push_attempts'])
+
+        with self._condition:
+            self._unpushed = False
+        self._set_status(state='idle', last_pushed_at=datetime.now().isoformat(timespec='seconds'), last_error=None)
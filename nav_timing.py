@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Stage timings are off unless a recorder is active on the thread (the dashboard's debug panel) or JSON
+# logging is enabled, either with NAV_TIMING_LOG (a file path, or "-" for stderr) or enable_timing_log()
+TIMING_LOG_ENV = "NAV_TIMING_LOG"
+
+logger = logging.getLogger("nav.timing")
+_log_enabled = False
+
+
+# Per-thread recorder and nesting depth; class-level defaults keep lookups on threads without a
+# recorder cheap (a missing threading.local attribute costs an exception)
+class _ThreadState(threading.local):
+    recorder = None
+    depth = 0
+
+
+_local = _ThreadState()
+
+
+# Function to emit every finished stage as one JSON log line, to `path` or stderr
+def enable_timing_log(path=None):
+    global _log_enabled
+    handler = logging.FileHandler(path) if path and path != "-" else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    _log_enabled = True
+
+
+# Collects the stages finished on one thread, e.g. during one dashboard rerun
+class StageRecorder:
+    def __init__(self):
+        self.records = []
+        self.started = time.perf_counter()
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+# Function to start collecting this thread's stages; returns the recorder
+def start_recording():
+    _local.recorder = StageRecorder()
+    _local.depth = 0
+    return _local.recorder
+
+
+def stop_recording():
+    recorder = _local.recorder
+    _local.recorder = None
+    return recorder
+
+
+class _Stage:
+    __slots__ = ('name', 'counters', 'recorder', 'depth', 'slot', 'started')
+
+    def __init__(self, name, counters, recorder):
+        self.name = name
+        self.counters = counters
+        self.recorder = recorder
+
+    # Function to attach counters (rows processed, tickers fetched, bytes written, ...) to the stage
+    def count(self, **counters):
+        self.counters.update(counters)
+
+    def __enter__(self):
+        self.depth = _local.depth
+        _local.depth = self.depth + 1
+        if self.recorder is not None:
+            # Reserve the record's place now so stages are listed in the order they started
+            self.slot = len(self.recorder.records)
+            self.recorder.records.append(None)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        _local.depth = self.depth
+        record = {'stage': self.name, 'ms': round(elapsed_ms, 3), 'depth': self.depth, **self.counters}
+        if self.recorder is not None:
+            self.recorder.records[self.slot] = record
+        if _log_enabled:
+            logger.info(json.dumps(record, default=str))
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def count(self, **counters):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+# Function to time a block: `with stage("read_excel") as s: ...; s.count(rows=n)`.
+# When timings are off it returns a shared no-op, so instrumented code pays one attribute lookup.
+def stage(name, **counters):
+    recorder = _local.recorder
+    if recorder is None and not _log_enabled:
+        return _NULL_STAGE
+    return _Stage(name, counters, recorder)
+
+
+if os.environ.get(TIMING_LOG_ENV):
+    enable_timing_log(os.environ[TIMING_LOG_ENV])
@@ -0,0 +1,493 @@
+import argparse
+import fcntl
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from dateutil import parser
+from openpyxl.styles import NamedStyle
+
+from nav_cache import load_cached_object
+from nav_engine import DEFAULT_MISSING_PRICE_POLICY, MISSING_PRICE_POLICIES, align_closes, compute_nav
+from nav_ledger import append_rows, clear_ledger, ledger_path, read_ledger
+from nav_publish import GitPublisher
+from nav_timing import enable_timing_log, stage
+from price_fetch import fetch_closing_prices, merge_price_windows
+from price_store import PriceStore
+
+# Define the directory where the workbooks are stored (this is in the same repo)
+WORKBOOK_DIR = "NAV"  # Folder where the Excel workbooks are stored
+
+# Marker the dashboard reads to show when the data was last refreshed
+UPDATE_MARKER_PATH = os.path.join(WORKBOOK_DIR, "last_updated.json")
+
+# Lock file flock()ed while an update runs; the kernel drops the lock when the holder exits or crashes
+UPDATE_LOCK_PATH = os.path.join(WORKBOOK_DIR, ".update.lock")
+
+# Open lock files of the locks this process holds, by path
+_held_locks = {}
+
+# Default pause between runs in --daemon mode
+DAEMON_INTERVAL_SECONDS = 15 * 60
+
+
+# Function to list available Excel files in the specified directory
+def list_workbooks(directory):
+    try:
+        return sorted(f for f in os.listdir(directory) if f.endswith('.xlsx'))
+    except FileNotFoundError:
+        print(f"Directory {directory} not found.")
+        return []
+
+# Function to return the trading day a run on `now` belongs to (weekends roll back to Friday)
+def trading_day(now=None):
+    day = (now or datetime.now()).date()
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+# Function to read the last-updated marker, or None if the updater has never completed a run
+def read_update_marker(path=UPDATE_MARKER_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_update_marker(modified_files, path=UPDATE_MARKER_PATH, now=None):
+    now = now or datetime.now()
+    marker = {
+        'trading_day': trading_day(now).isoformat(),
+        'updated_at': now.isoformat(timespec='seconds'),
+        'files': modified_files,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(marker, f, indent=2)
+    os.replace(tmp_path, path)
+    return marker
+
+# Function to take the update lock; returns False if another updater already holds it.
+# The file itself is never removed, so there is no stale lock to take over and no race in doing so.
+def acquire_update_lock(path=UPDATE_LOCK_PATH):
+    lock_file = open(path, 'a+')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+    lock_file.truncate(0)
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    _held_locks[path] = lock_file
+    return True
+
+def release_update_lock(path=UPDATE_LOCK_PATH):
+    lock_file = _held_locks.pop(path, None)
+    if lock_file is not None:
+        lock_file.close()  # Closing the file releases the flock
+
+# Function to tell whether this trading day already has a completed update
+def already_updated():
+    marker = read_update_marker()
+    if marker and marker.get('trading_day') == trading_day().isoformat():
+        print(f"Already updated for {marker['trading_day']} at {marker['updated_at']}. Skipping.")
+        return True
+    return False
+
+# Function to run one update unless this trading day is already done or another run is in progress
+def run_update(provider=None, force=False, missing=DEFAULT_MISSING_PRICE_POLICY):
+    if not force and already_updated():
+        return None
+
+    if not acquire_update_lock():
+        print("Another update is already running. Skipping.")
+        return None
+
+    try:
+        # A run that finished after the check above has already done this trading day
+        if not force and already_updated():
+            return None
+        with stage("update"):
+            modify_all_workbooks_and_push_to_github(provider=provider, missing=missing)
+        return read_update_marker()
+    finally:
+        release_update_lock()
+
+# Function to modify all Excel files in the directory and push them to GitHub
+def modify_all_workbooks_and_push_to_github(provider=None, missing=DEFAULT_MISSING_PRICE_POLICY):
+    workbooks = list_workbooks(WORKBOOK_DIR)
+    if not workbooks:
+        print("No workbooks found to modify.")
+        return []
+
+    plans = {}
+    for filename in workbooks:
+        try:
+            plans[filename] = plan_workbook_update(filename)
+        except Exception as e:
+            print(f"Error modifying {filename}: {e}")
+
+    # Fetch each symbol once for all workbooks, asking the provider only for dates not already stored
+    fetch_errors = {}
+    with PriceStore() as store:
+        prices = fetch_closing_prices(price_windows(plans.values()), provider=provider, store=store, errors=fetch_errors)
+
+    modified_files = []
+
+    for filename, plan in plans.items():
+        if fetch_errors:
+            plan = without_failed_sheets(plan, fetch_errors)
+        try:
+            if apply_workbook_update(plan, prices, missing):
+                modified_files.append(os.path.relpath(ledger_path(plan['file_path']), WORKBOOK_DIR))
+        except Exception as e:
+            print(f"Error modifying {filename}: {e}")
+
+    # Publish the marker together with the new rows so deployed dashboards see when data changed.
+    # A run whose price fetch failed leaves the day unmarked, so the next run retries it.
+    published = list(modified_files)
+    if fetch_errors:
+        print(f"Price fetch failed for {', '.join(sorted(fetch_errors))}; not marking {trading_day()} as updated.")
+    else:
+        write_update_marker(modified_files)
+        published.append(os.path.basename(UPDATE_MARKER_PATH))
+    if modified_files:
+        git_add_commit_push(published)
+
+    return modified_files
+
+# Function to leave out the sheets holding a symbol whose fetch failed: appending their other dates would move
+# the sheet past the days the retry (the unwritten trading-day marker) is meant to fill
+def without_failed_sheets(plan, failed_symbols):
+    sheets = {}
+    for sheet_name, state in plan['sheets'].items():
+        failed = sorted(set(state['stocks']) & set(failed_symbols))
+        if failed:
+            print(f"Skipping sheet {sheet_name} of {plan['filename']}: price fetch failed for {', '.join(failed)}.")
+        else:
+            sheets[sheet_name] = state
+    return {**plan, 'sheets': sheets}
+
+# Function to modify a single Excel workbook
+def modify_workbook(filename, prices=None, provider=None, missing=DEFAULT_MISSING_PRICE_POLICY):
+    plan = plan_workbook_update(filename)
+    if prices is None:
+        with PriceStore() as store:
+            prices = fetch_closing_prices(price_windows([plan]), provider=provider, store=store)
+    apply_workbook_update(plan, prices, missing)
+
+# Function to read what each sheet of a workbook needs for its update, without loading it for writing
+def plan_workbook_update(filename):
+    file_path = os.path.join(WORKBOOK_DIR, filename)
+    with stage("plan_workbook", workbook=filename) as timing:
+        sheets = read_sheet_summaries(file_path)
+
+        # Rows appended since the last export extend the sheets beyond what the xlsx holds
+        pending = read_ledger(file_path)
+        for sheet_name, state in sheets.items():
+            advance_sheet_state(state, pending.get(sheet_name, []))
+        timing.count(sheets=len(sheets), pending_rows=sum(len(rows) for rows in pending.values()))
+
+    return {'filename': filename, 'file_path': file_path, 'sheets': sheets}
+
+# Function to summarize every sheet of a workbook, streaming it read-only and only when the file has changed
+def read_sheet_summaries(file_path):
+    def summarize(path):
+        with stage("scan_sheets", workbook=os.path.basename(path)):
+            workbook = openpyxl.load_workbook(path, read_only=True)
+            try:
+                states = {sheet_name: read_sheet_state(workbook[sheet_name], sheet_name) for sheet_name in workbook.sheetnames}
+            finally:
+                workbook.close()
+        return {sheet_name: state for sheet_name, state in states.items() if state is not None}
+
+    return load_cached_object(file_path, "sheets", summarize)
+
+# Function to move a sheet summary past rows that are in the ledger but not yet in the xlsx
+def advance_sheet_state(state, rows):
+    for row in rows:
+        state['existing_dates'].add(row[0].date())
+        state['next_date'] = max(state['next_date'], row[0] + timedelta(days=1))
+        basket_value, nav_value = row[7], row[9]
+        if basket_value:
+            state['last_basket_value'] = basket_value
+        if nav_value:
+            state['last_nav'] = nav_value
+        state['last_prices'] = row[2:2 + len(state['stocks'])]
+    return state
+
+# Function to list the (symbols, first missing date) price window of every sheet in the given plans
+def price_windows(plans):
+    return merge_price_windows(
+        (state['stocks'].keys(), state['next_date'])
+        for plan in plans
+        for state in plan['sheets'].values()
+    )
+
+# Function to parse a text date cell, returning None for text that is not a date (e.g. the 'Date' header)
+def parse_date_text(value):
+    try:
+        # ISO dates, which is how the workbooks store them, skip the much slower dateutil parser
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        pass
+    try:
+        return parser.parse(value)
+    except (ValueError, OverflowError):
+        return None
+
+# Function to summarize a sheet in one streaming pass: last data row, existing dates, last date,
+# last NAV/basket value and the current stocks/quantities block
+def read_sheet_state(ws, sheet_name):
+    nav_column_index = 10
+    basket_value_column_index = 8
+
+    last_row = 1
+    existing_dates = set()
+    last_date = None
+    last_non_zero_nav = last_basket_value = last_prices = None
+    seen_nav = seen_basket = None
+    stocks_values = quantities_values = None
+
+    rows = ws.iter_rows(min_row=1, max_col=nav_column_index, values_only=True)
+    for row_number, values in enumerate(rows, start=1):
+        date_value, header = values[0], values[1]
+
+        if header == "Stocks":
+            stocks_values = values[2:7]
+        elif header == "Quantities":
+            quantities_values = values[2:7]
+
+        if row_number >= 2:
+            # Most dates in the workbooks are stored as text; the 'Stocks' rows hold the 'Date' label instead
+            if isinstance(date_value, str) and date_value and header != "Stocks":
+                date_value = parse_date_text(date_value) or date_value
+            if isinstance(date_value, datetime):
+                existing_dates.add(date_value.date())
+                last_date = date_value
+
+            nav_value = values[nav_column_index - 1]
+            basket_value = values[basket_value_column_index - 1]
+            if isinstance(nav_value, (int, float)) and nav_value != 0:
+                seen_nav = nav_value
+            if isinstance(basket_value, (int, float)) and basket_value != 0:
+                seen_basket = basket_value
+
+        # Anything below the last row with a date column value is ignored, as it is not part of the series
+        if date_value not in (None, ""):
+            last_row = row_number
+            last_non_zero_nav, last_basket_value = seen_nav, seen_basket
+            # Dates are often stored as text, so the prices come from this row whatever the date cell holds
+            last_prices = values[2:7]
+
+    if last_date is None:
+        # If no valid date is found, set a fallback date
+        last_date = datetime.now() - timedelta(days=1)
+
+    if last_non_zero_nav is None:
+        last_non_zero_nav = 100  # Default initial NAV
+
+    if last_basket_value is None:
+        print("No previous basket value found, setting to 100")
+        last_basket_value = 100  # Default basket value in case none is found
+
+    if stocks_values is None or quantities_values is None:
+        print(f"Could not find 'Stocks' or 'Quantities' headers in sheet {sheet_name}. Skipping sheet.")
+        return None
+
+    stocks = {}
+    quantities = []
+    stock_prices = []
+
+    for stock_symbol, quantity, price in zip(stocks_values, quantities_values, last_prices or [None] * 5):
+        if stock_symbol and isinstance(stock_symbol, str):
+            stocks[stock_symbol] = stock_symbol
+            quantities.append(quantity)
+            # The last row's closes, used to fill a stock's first missing close under the "ffill" policy
+            stock_prices.append(price if isinstance(price, (int, float)) else None)
+
+    return {
+        'last_row': last_row,
+        'existing_dates': existing_dates,
+        'next_date': last_date + timedelta(days=1),
+        'last_nav': last_non_zero_nav,
+        'last_basket_value': last_basket_value,
+        'stocks': stocks,
+        'quantities': quantities,
+        'last_prices': stock_prices,
+    }
+
+# Function to append the new rows of every planned sheet to the workbook's ledger; returns the row count
+def apply_workbook_update(plan, prices, missing=DEFAULT_MISSING_PRICE_POLICY):
+    filename = plan['filename']
+    appended = 0
+    try:
+        for sheet_name, state in plan['sheets'].items():
+            print(f"Modifying sheet: {sheet_name}")
+            with stage("build_sheet_rows", workbook=filename, sheet=sheet_name) as timing:
+                rows = build_sheet_rows(state, prices, missing)
+                timing.count(rows=len(rows))
+            append_rows(plan['file_path'], sheet_name, rows)
+            appended += len(rows)
+
+    except Exception as e:
+        print(f"Error modifying {filename}: {e}")
+
+    return appended
+
+# Function to compute the rows to add to one sheet, laid out like the sheet's columns A to J
+def build_sheet_rows(state, prices, missing=DEFAULT_MISSING_PRICE_POLICY):
+    symbols = list(state['stocks'].keys())
+
+    # Step 5: Take this sheet's slice of the batch-fetched prices
+    next_date = pd.Timestamp(state['next_date']).normalize()
+    today = pd.Timestamp(datetime.now().strftime('%Y-%m-%d'))
+    sheet_prices = {}
+    for stock_symbol in symbols:
+        closes = prices.get(stock_symbol)
+        if closes is not None:
+            sheet_prices[stock_symbol] = closes[(closes.index >= next_date) & (closes.index < today)]
+    closing_dates = pd.DatetimeIndex(sorted(set().union(*(closes.index for closes in sheet_prices.values()))))
+
+    # Check if the date already exists in the worksheet
+    existing = np.array([date_value.date() in state['existing_dates'] for date_value in closing_dates], dtype=bool)
+    for date_value in closing_dates[existing]:
+        print(f"Date {date_value.date()} already exists. Skipping.")
+    closing_dates = closing_dates[~existing]
+
+    # Step 6: Compute basket values, returns and NAV for all new dates at once
+    result = compute_nav(
+        align_closes(sheet_prices, symbols, closing_dates),
+        state['quantities'],
+        state['last_basket_value'],
+        state['last_nav'],
+        missing=missing,
+        last_prices=state.get('last_prices'),
+    )
+    for date_value in closing_dates[~result['keep']]:
+        print(f"Missing prices on {date_value.date()}. Skipping.")
+
+    rows = []
+    # Prices start at column C; unused stock columns stay empty
+    padding = [None] * (5 - len(symbols))
+    for date_value, stock_prices, basket_value, ret, nav in zip(
+        closing_dates[result['keep']], result['prices'].tolist(), result['basket'].tolist(),
+        result['returns'].tolist(), result['nav'].tolist(),
+    ):
+        rows.append([date_value.to_pydatetime(), None, *stock_prices, *padding, basket_value, ret, nav])
+        state['existing_dates'].add(date_value.date())
+
+    return rows
+
+# Function to fold the pending ledger rows into the xlsx workbooks (a full load and save per workbook)
+def export_workbooks(filenames=None):
+    exported = []
+    for filename in filenames or list_workbooks(WORKBOOK_DIR):
+        file_path = os.path.join(WORKBOOK_DIR, filename)
+        pending = read_ledger(file_path)
+        if not any(pending.values()):
+            continue
+
+        try:
+            workbook = openpyxl.load_workbook(file_path)
+
+            # Create a style for date formatting
+            date_style = NamedStyle(name="datetime", number_format='yyyy-mm-dd')
+
+            if "datetime" not in workbook.named_styles:
+                workbook.add_named_style(date_style)
+
+            for sheet_name, rows in pending.items():
+                if sheet_name not in workbook.sheetnames:
+                    print(f"Sheet {sheet_name} not found in {filename}. Keeping its rows in the ledger.")
+                    continue
+                ws = workbook[sheet_name]
+                state = read_sheet_state(ws, sheet_name)
+                last_row = state['last_row'] if state else ws.max_row
+
+                for row in rows:
+                    last_row += 1  # Add data to the immediate next row after the last data row
+                    date_cell = ws.cell(row=last_row, column=1, value=row[0])
+                    date_cell.number_format = 'yyyy-mm-dd'  # Apply the date style to the cell
+                    for column, value in enumerate(row[2:], start=3):
+                        if value is not None:
+                            ws.cell(row=last_row, column=column, value=value)
+
+            with stage("save_workbook", workbook=filename) as timing:
+                workbook.save(file_path)
+                timing.count(bytes=os.path.getsize(file_path), rows=sum(len(rows) for rows in pending.values()))
+            clear_ledger(file_path)
+            exported.append(filename)
+        except Exception as e:
+            print(f"Error exporting {filename}: {e}")
+
+    return exported
+
+# Publisher shared by every update this process makes, so a slow push never holds up the next run
+_publisher = None
+
+def git_publisher():
+    global _publisher
+    if _publisher is None:
+        _publisher = GitPublisher()
+    return _publisher
+
+# Function to queue the modified files for publishing; staging, committing and pushing happen in the background
+def git_add_commit_push(modified_files):
+    commit_message = f"Updated {', '.join(modified_files)} with new data"
+    git_publisher().publish([f"{WORKBOOK_DIR}/{filename}" for filename in modified_files], commit_message)
+
+# Function to wait for queued publishing before the process exits, reporting how it went
+def finish_publishing():
+    if _publisher is None:
+        return
+    if not _publisher.flush():
+        status = _publisher.status()
+        print(f"Publishing failed after {status['push_attempts']} push attempt(s): {status['last_error']}")
+    _publisher.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Append the latest prices to the NAV workbooks and publish them.")
+    arg_parser.add_argument("--force", action="store_true", help="update even if today's trading day is already done")
+    arg_parser.add_argument("--daemon", action="store_true", help="keep running and check for updates periodically")
+    arg_parser.add_argument("--interval", type=int, default=DAEMON_INTERVAL_SECONDS, help="seconds between checks in --daemon mode")
+    arg_parser.add_argument("--export", action="store_true", help="write the pending ledger rows into the xlsx workbooks and publish them")
+    arg_parser.add_argument("--missing-prices", choices=MISSING_PRICE_POLICIES, default=DEFAULT_MISSING_PRICE_POLICY,
+                            help="how a date with a missing close is handled: carry the previous close forward, or skip the date")
+    arg_parser.add_argument("--timing-log", metavar="PATH", help="log per-stage timings as JSON lines to PATH ('-' for stderr)")
+    args = arg_parser.parse_args()
+
+    if args.timing_log:
+        enable_timing_log(args.timing_log)
+
+    try:
+        if args.export:
+            # An update appending to a ledger between reading and clearing it would lose those rows
+            if not acquire_update_lock():
+                print("An update is running. Skipping export.")
+                return
+            try:
+                exported = export_workbooks()
+            finally:
+                release_update_lock()
+            if exported:
+                ledgers = [os.path.relpath(ledger_path(os.path.join(WORKBOOK_DIR, f)), WORKBOOK_DIR) for f in exported]
+                git_add_commit_push(exported + ledgers)
+            return
+
+        # In --daemon mode pushes run alongside the next wait; updates queued meanwhile share a commit
+        run_update(force=args.force, missing=args.missing_prices)
+        while args.daemon:
+            time.sleep(args.interval)
+            run_update(missing=args.missing_prices)
+    finally:
+        finish_publishing()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import yfinance as yf
+from tenacity import Retrying, stop_after_attempt, wait_exponential
+
+from nav_timing import stage
+
+# Upper bound on simultaneous requests to the price provider
+MAX_FETCH_WORKERS = 8
+FETCH_ATTEMPTS = 3
+
+
+# Price provider backed by Yahoo Finance; any object with the same history() method can replace it
+class YFinancePriceProvider:
+    def history(self, symbol, start, end):
+        hist = yf.Ticker(symbol).history(start=start, end=end, interval="1d", auto_adjust=False)
+        if hist.empty:
+            return pd.Series(dtype=float)
+        # Keep the exchange's calendar date and drop the timezone, as the workbooks store plain dates
+        dates = pd.DatetimeIndex(hist.index.strftime('%Y-%m-%d'))
+        return pd.Series(hist['Close'].to_numpy(dtype=float), index=dates)
+
+
+# Price provider serving fixed closing-price series, for tests and benchmarks that must not hit the network
+class StaticPriceProvider:
+    def __init__(self, closes):
+        self.closes = {symbol: series.sort_index() for symbol, series in closes.items()}
+        self.calls = []
+
+    def history(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        series = self.closes.get(symbol)
+        if series is None:
+            return pd.Series(dtype=float)
+        return series[(series.index >= pd.Timestamp(start)) & (series.index < pd.Timestamp(end))]
+
+
+# Function to fetch one symbol's closes, retrying transient provider errors with exponential backoff
+def _fetch_symbol(provider, symbol, start, end):
+    with stage("fetch_symbol", symbol=symbol) as timing:
+        for attempt in Retrying(stop=stop_after_attempt(FETCH_ATTEMPTS), wait=wait_exponential(multiplier=1, max=10), reraise=True):
+            with attempt:
+                closes = provider.history(symbol, start, end)
+                timing.count(rows=len(closes), attempts=attempt.retry_state.attempt_number)
+                return closes
+
+
+# Function to fetch closing prices for many symbols at once.
+# `windows` maps each symbol to the earliest date any sheet needs; every symbol is requested once.
+# With a PriceStore only the dates it does not hold yet are requested, and results are read back from it.
+# Symbols whose fetch raised are recorded in `errors` (symbol -> exception) when a dict is passed.
+def fetch_closing_prices(windows, end=None, provider=None, max_workers=MAX_FETCH_WORKERS, store=None, errors=None):
+    if not windows:
+        return {}
+    provider = provider or YFinancePriceProvider()
+    end_str = end or datetime.now().strftime('%Y-%m-%d')
+
+    requests = store.missing_windows(windows, end_str) if store is not None else windows
+    fetched = {}
+    with stage("fetch_prices", symbols=len(windows), tickers_fetched=len(requests)):
+        if requests:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(requests))) as executor:
+                futures = {
+                    symbol: executor.submit(_fetch_symbol, provider, symbol, pd.Timestamp(start).strftime('%Y-%m-%d'), end_str)
+                    for symbol, start in requests.items()
+                }
+                for symbol, future in futures.items():
+                    try:
+                        fetched[symbol] = future.result()
+                    except Exception as e:
+                        print(f"Error fetching data for {symbol}: {e}")
+                        if errors is not None:
+                            errors[symbol] = e
+                        continue
+                    # SQLite connections stay on this thread, so the store is written here rather than in the workers
+                    if store is not None:
+                        store.write(symbol, fetched[symbol], requests[symbol])
+
+    prices = {}
+    for symbol, start in windows.items():
+        closes = store.read(symbol, start, end_str) if store is not None else fetched.get(symbol)
+        if closes is None:
+            continue
+        if closes.empty:
+            print(f"No data found for {symbol}. Skipping.")
+            continue
+        prices[symbol] = closes
+
+    return prices
+
+
+# Function to merge the price windows of several sheets into one window per symbol
+def merge_price_windows(sheet_windows):
+    windows = {}
+    for symbols, start in sheet_windows:
+        for symbol in symbols:
+            if symbol not in windows or start < windows[symbol]:
+                windows[symbol] = start
+    return windows
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+# Local store of every closing price fetched so far, shared by all workbooks and readable offline
+PRICE_STORE_PATH = os.path.join("NAV", "prices.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS closes (
+    symbol TEXT NOT NULL,
+    date TEXT NOT NULL,
+    close REAL NOT NULL,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    symbol TEXT PRIMARY KEY,
+    first_date TEXT NOT NULL,
+    fetched_through TEXT NOT NULL
+);
+"""
+
+
+# SQLite-backed price store. `coverage` remembers which [first_date, fetched_through) window the provider
+# has already answered, so weekends and holidays inside it are not re-requested every run.
+class PriceStore:
+    def __init__(self, path=PRICE_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Function to list the symbols the store holds prices for
+    def symbols(self):
+        return [row[0] for row in self.connection.execute("SELECT symbol FROM coverage ORDER BY symbol")]
+
+    # Function to return the window already fetched for a symbol, or None if it was never fetched
+    def coverage(self, symbol):
+        row = self.connection.execute(
+            "SELECT first_date, fetched_through FROM coverage WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        return row if row is None else (pd.Timestamp(row[0]), pd.Timestamp(row[1]))
+
+    # Function to shrink requested windows (symbol -> start date) to the part the store does not cover yet
+    def missing_windows(self, windows, end):
+        end = pd.Timestamp(end)
+        missing = {}
+        for symbol, start in windows.items():
+            start = pd.Timestamp(start)
+            known = self.coverage(symbol)
+            if known is None or start < known[0]:
+                missing[symbol] = start
+            elif known[1] < end:
+                missing[symbol] = known[1]
+        return missing
+
+    # Function to save fetched closes and extend the symbol's covered window from `start` to the day after
+    # the last close returned. Providers report rate limits and outages as an empty response rather than
+    # an error, so days after the last close (and empty responses altogether) are asked for again next run.
+    def write(self, symbol, closes, start):
+        rows = [(symbol, date.strftime('%Y-%m-%d'), float(close)) for date, close in closes.items() if pd.notna(close)]
+        if not rows:
+            return
+        start = pd.Timestamp(start).strftime('%Y-%m-%d')
+        fetched_through = (pd.Timestamp(max(row[1] for row in rows)) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO closes VALUES (?, ?, ?)", rows)
+            self.connection.execute(
+                """
+                INSERT INTO coverage VALUES (?, ?, ?)
+                ON CONFLICT(symbol) DO UPDATE SET
+                    first_date = MIN(first_date, excluded.first_date),
+                    fetched_through = MAX(fetched_through, excluded.fetched_through)
+                """,
+                (symbol, start, fetched_through),
+            )
+
+    # Function to read a symbol's closes in [start, end) as a date-indexed Series
+    def read(self, symbol, start=None, end=None):
+        query = "SELECT date, close FROM closes WHERE symbol = ?"
+        params = [symbol]
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            query += " AND date < ?"
+            params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+        rows = self.connection.execute(query + " ORDER BY date", params).fetchall()
+        if not rows:
+            return pd.Series(dtype=float)
+        dates, closes = zip(*rows)
+        return pd.Series(closes, index=pd.DatetimeIndex(dates), dtype=float)
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nav_engine import compute_nav
+from nav_updater import build_sheet_rows
+
+nan = np.nan
+
+
+def test_nav_chains_basket_returns():
+    result = compute_nav([[10.0, 20.0], [11.0, 22.0]], [1, 2], last_basket_value=50.0, last_nav=100.0)
+
+    assert result['keep'].tolist() == [True, True]
+    assert result['basket'].tolist() == [50.0, 55.0]
+    assert result['returns'].tolist() == pytest.approx([0.0, 0.1])
+    assert result['nav'].tolist() == pytest.approx([100.0, 110.0])
+
+
+def test_ffill_fills_gaps_followed_by_a_real_close():
+    prices = [[nan, 20.0], [11.0, nan], [12.0, 21.0]]
+    result = compute_nav(prices, [1, 1], 30.0, 100.0, missing="ffill", last_prices=[10.0, 19.0])
+
+    # The first date takes the sheet's last close, the second carries the previous one forward
+    assert result['keep'].tolist() == [True, True, True]
+    assert result['prices'].tolist() == [[10.0, 20.0], [11.0, 20.0], [12.0, 21.0]]
+
+
+def test_ffill_drops_dates_after_a_symbols_last_close():
+    prices = [[10.0, 20.0], [11.0, nan], [12.0, nan]]
+    result = compute_nav(prices, [1, 1], 30.0, 100.0, missing="ffill", last_prices=[9.0, 19.0])
+
+    # The second stock's close may not be published yet; those dates wait for a later run
+    assert result['keep'].tolist() == [True, False, False]
+    assert result['prices'].tolist() == [[10.0, 20.0]]
+
+
+@pytest.mark.parametrize("missing", ["ffill", "skip"])
+def test_symbol_without_closes_drops_the_whole_window(missing):
+    prices = [[10.0, nan], [11.0, nan]]
+    result = compute_nav(prices, [1, 1], 30.0, 100.0, missing=missing, last_prices=[9.0, 19.0])
+
+    assert not result['keep'].any()
+    assert len(result['nav']) == 0
+
+
+def test_skip_drops_every_date_with_a_missing_close():
+    prices = [[nan, 20.0], [11.0, nan], [12.0, 21.0]]
+    result = compute_nav(prices, [1, 1], 30.0, 100.0, missing="skip", last_prices=[10.0, 19.0])
+
+    assert result['keep'].tolist() == [False, False, True]
+    assert result['prices'].tolist() == [[12.0, 21.0]]
+
+
+def test_non_finite_quantity_is_rejected():
+    with pytest.raises(ValueError):
+        compute_nav([[10.0, 20.0]], [1, None], 30.0, 100.0)
+
+
+def test_empty_response_writes_no_rows():
+    state = {
+        'existing_dates': set(),
+        'next_date': datetime(2025, 10, 1),
+        'last_nav': 100.0,
+        'last_basket_value': 30.0,
+        'stocks': {'A.NS': 'A.NS', 'B.NS': 'B.NS'},
+        'quantities': [1, 1],
+        'last_prices': [10.0, 20.0],
+    }
+    dates = pd.bdate_range('2025-10-01', '2025-10-15')
+    # fetch_closing_prices leaves out a symbol whose response was empty or whose fetch raised
+    prices = {'A.NS': pd.Series(np.arange(len(dates), dtype=float) + 10, index=dates)}
+
+    assert build_sheet_rows(state, prices) == []
+    assert build_sheet_rows(state, prices, missing="skip") == []
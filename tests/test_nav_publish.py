@@ -0,0 +1,113 @@
+import os
+import subprocess
+
+import pytest
+
+from nav_publish import GitPublisher
+
+
+def git(*args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout
+
+
+# A working clone of a local bare repository with one file already pushed
+@pytest.fixture
+def repo(tmp_path):
+    remote = str(tmp_path / "remote.git")
+    work = str(tmp_path / "work")
+    git("init", "--bare", "-b", "master", remote, cwd=tmp_path)
+    git("clone", remote, work, cwd=tmp_path)
+    git("config", "user.email", "updater@example.com", cwd=work)
+    git("config", "user.name", "NAV updater", cwd=work)
+    git("symbolic-ref", "HEAD", "refs/heads/master", cwd=work)
+    os.makedirs(os.path.join(work, "NAV"))
+    write(work, "NAV/a.csv", "a\n")
+    git("add", ".", cwd=work)
+    git("commit", "-m", "Initial data", cwd=work)
+    git("push", "origin", "master", cwd=work)
+    return work, remote
+
+
+def write(work, path, text):
+    with open(os.path.join(work, path), "a") as f:
+        f.write(text)
+
+
+def remote_log(remote):
+    return git("log", "--format=%s", "master", cwd=remote).splitlines()
+
+
+def publisher(work):
+    return GitPublisher(repo_dir=work, coalesce_seconds=0.2, push_attempts=2, backoff_max=0)
+
+
+def test_updates_queued_together_share_one_commit(repo):
+    work, remote = repo
+    publishing = publisher(work)
+    write(work, "NAV/a.csv", "1\n")
+    write(work, "NAV/b.csv", "b\n")
+    publishing.publish(["NAV/a.csv"], "Updated a.csv with new data")
+    publishing.publish(["NAV/b.csv", "NAV/a.csv"], "Updated b.csv with new data")
+
+    assert publishing.flush(timeout=30)
+    publishing.close(timeout=5)
+
+    assert remote_log(remote) == ["Updated 2 files with new data", "Initial data"]
+    body = git("log", "-1", "--format=%b", "master", cwd=remote)
+    assert "- Updated a.csv with new data" in body and "- Updated b.csv with new data" in body
+    assert publishing.status()['state'] == 'idle'
+
+
+def test_unchanged_files_make_no_commit(repo, capsys):
+    work, remote = repo
+    publishing = publisher(work)
+    publishing.publish(["NAV/a.csv"], "Updated a.csv with new data")
+
+    assert publishing.flush(timeout=30)
+    publishing.close(timeout=5)
+
+    assert "No changes to commit." in capsys.readouterr().out
+    assert remote_log(remote) == ["Initial data"]
+    assert publishing.status()['last_commit'] is None
+
+
+def test_unpushed_commit_is_pushed_with_the_next_batch(repo, tmp_path):
+    work, remote = repo
+    publishing = publisher(work)
+
+    # The remote is unreachable: the commit is made but every push attempt fails
+    git("remote", "set-url", "origin", str(tmp_path / "missing.git"), cwd=work)
+    write(work, "NAV/a.csv", "1\n")
+    publishing.publish(["NAV/a.csv"], "Updated a.csv with new data")
+    assert not publishing.flush(timeout=30)
+    status = publishing.status()
+    assert status['state'] == 'failed'
+    assert status['unpushed_commits']
+    assert status['push_attempts'] == 2
+
+    # Back online: the next batch pushes its own commit and the one left behind
+    git("remote", "set-url", "origin", remote, cwd=work)
+    write(work, "NAV/b.csv", "b\n")
+    publishing.publish(["NAV/b.csv"], "Updated b.csv with new data")
+    assert publishing.flush(timeout=30)
+    publishing.close(timeout=5)
+
+    assert remote_log(remote) == ["Updated b.csv with new data", "Updated a.csv with new data", "Initial data"]
+    assert not publishing.status()['unpushed_commits']
+
+
+def test_unpushed_commit_is_retried_when_nothing_new_changed(repo, tmp_path):
+    work, remote = repo
+    publishing = publisher(work)
+
+    git("remote", "set-url", "origin", str(tmp_path / "missing.git"), cwd=work)
+    write(work, "NAV/a.csv", "1\n")
+    publishing.publish(["NAV/a.csv"], "Updated a.csv with new data")
+    assert not publishing.flush(timeout=30)
+
+    git("remote", "set-url", "origin", remote, cwd=work)
+    publishing.publish(["NAV/a.csv"], "Updated a.csv with new data")
+    assert publishing.flush(timeout=30)
+    publishing.close(timeout=5)
+
+    assert remote_log(remote) == ["Updated a.csv with new data", "Initial data"]
@@ -0,0 +1,49 @@
+import pandas as pd
+
+from price_fetch import StaticPriceProvider, fetch_closing_prices
+from price_store import PriceStore
+
+
+def closes(*dates):
+    return pd.Series([100.0 + i for i in range(len(dates))], index=pd.DatetimeIndex(dates))
+
+
+def test_empty_response_is_requested_again(tmp_path):
+    with PriceStore(str(tmp_path / "prices.sqlite")) as store:
+        # An outage or rate limit: the provider answers with no rows and does not raise
+        empty = StaticPriceProvider({})
+        assert fetch_closing_prices({'INFY.NS': '2025-05-05'}, end='2025-05-08', provider=empty, store=store) == {}
+        assert store.coverage('INFY.NS') is None
+
+        provider = StaticPriceProvider({'INFY.NS': closes('2025-05-05', '2025-05-06', '2025-05-07')})
+        prices = fetch_closing_prices({'INFY.NS': '2025-05-05'}, end='2025-05-08', provider=provider, store=store)
+
+    assert provider.calls == [('INFY.NS', '2025-05-05', '2025-05-08')]
+    assert list(prices['INFY.NS'].index.strftime('%Y-%m-%d')) == ['2025-05-05', '2025-05-06', '2025-05-07']
+
+
+def test_coverage_stops_after_last_close(tmp_path):
+    with PriceStore(str(tmp_path / "prices.sqlite")) as store:
+        # Only the first two days came back; the 7th is missing from the response
+        partial = StaticPriceProvider({'INFY.NS': closes('2025-05-05', '2025-05-06')})
+        fetch_closing_prices({'INFY.NS': '2025-05-05'}, end='2025-05-08', provider=partial, store=store)
+        assert store.coverage('INFY.NS') == (pd.Timestamp('2025-05-05'), pd.Timestamp('2025-05-07'))
+
+        provider = StaticPriceProvider({'INFY.NS': closes('2025-05-05', '2025-05-06', '2025-05-07')})
+        prices = fetch_closing_prices({'INFY.NS': '2025-05-05'}, end='2025-05-08', provider=provider, store=store)
+
+    assert provider.calls == [('INFY.NS', '2025-05-07', '2025-05-08')]
+    assert len(prices['INFY.NS']) == 3
+
+
+def test_covered_closed_days_are_not_requested_again(tmp_path):
+    with PriceStore(str(tmp_path / "prices.sqlite")) as store:
+        # Friday and the following Monday: the weekend between them is covered
+        first = StaticPriceProvider({'INFY.NS': closes('2025-05-09', '2025-05-12')})
+        fetch_closing_prices({'INFY.NS': '2025-05-09'}, end='2025-05-13', provider=first, store=store)
+
+        provider = StaticPriceProvider({'INFY.NS': closes('2025-05-09', '2025-05-12', '2025-05-13')})
+        prices = fetch_closing_prices({'INFY.NS': '2025-05-09'}, end='2025-05-14', provider=provider, store=store)
+
+    assert provider.calls == [('INFY.NS', '2025-05-13', '2025-05-14')]
+    assert len(prices['INFY.NS']) == 3